@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+冷启动基准测试
+
+1. 导入耗时：用 python -X importtime 统计 import server 的总耗时及最慢的模块
+2. 首个请求延迟：启动服务器子进程，等待健康检查通过后测量第一次和第二次
+   tools/call 的延迟；分别在开启和关闭启动预热（MCP_WARMUP_ENABLED）时运行
+
+首个请求测试需要配置好与生产相同的数据库环境变量。
+
+用法:
+    python benchmarks/cold_start.py
+    python benchmarks/cold_start.py --skip-requests
+    python benchmarks/cold_start.py --tool get_latest_report --runs 3
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def measure_import(top: int) -> None:
+    """统计 import server 的耗时（微秒，cumulative）"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True
+    )
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((int(cumulative_us), int(self_us), name.strip()))
+
+    total = next((cum for cum, _, name in modules if name == "server"), None)
+    print("== 导入耗时 ==")
+    print(f"import server: {total / 1000:.1f} ms" if total else "import server: 失败")
+    for heavy in ("supabase", "psycopg2", "uvicorn"):
+        loaded = any(name == heavy for _, _, name in modules)
+        print(f"  {heavy}: {'已在导入时加载' if loaded else '未加载（延迟导入）'}")
+
+    print(f"最慢的 {top} 个顶层模块 (cumulative):")
+    top_level = [m for m in modules if "." not in m[2]]
+    for cumulative, _, name in sorted(top_level, reverse=True)[:top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_request(tool: str, arguments: dict, warmup: bool, timeout: float) -> dict:
+    """启动服务器，测量就绪时间以及前两次工具调用的延迟（毫秒）"""
+    port = _free_port()
+    env = dict(
+        os.environ,
+        MCP_SERVER_HOST="127.0.0.1",
+        MCP_SERVER_PORT=str(port),
+        MCP_WARMUP_ENABLED="true" if warmup else "false",
+        MCP_RATE_LIMIT_ENABLED="false"
+    )
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "server.py"],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        with httpx.Client(timeout=timeout) as client:
+            while True:
+                if time.perf_counter() - started > timeout:
+                    raise TimeoutError("服务器未在超时时间内就绪")
+                try:
+                    # 预热模式等待就绪探针；延迟初始化模式只等待进程可以处理请求
+                    probe = "/health/ready" if warmup else "/health/live"
+                    if client.get(f"{base}{probe}").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.02)
+            ready_ms = (time.perf_counter() - started) * 1000
+
+            latencies = []
+            for i in range(2):
+                payload = {
+                    "jsonrpc": "2.0",
+                    "method": "tools/call",
+                    "params": {"name": tool, "arguments": arguments},
+                    "id": i
+                }
+                call_started = time.perf_counter()
+                client.post(f"{base}/mcp", json=payload).raise_for_status()
+                latencies.append((time.perf_counter() - call_started) * 1000)
+                # 附加一个未声明的参数绕过工具结果缓存，第二次调用仍会访问后端
+                arguments = dict(arguments, _bench=i)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    return {"ready_ms": ready_ms, "first_ms": latencies[0], "second_ms": latencies[1]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动基准测试")
+    parser.add_argument("--tool", default="get_latest_report", help="首个请求调用的工具")
+    parser.add_argument("--arguments", default="{}", help="工具参数（JSON）")
+    parser.add_argument("--runs", type=int, default=1, help="每种模式的运行次数")
+    parser.add_argument("--top", type=int, default=10, help="显示最慢的模块数量")
+    parser.add_argument("--timeout", type=float, default=60.0, help="就绪和请求超时（秒）")
+    parser.add_argument("--skip-requests", action="store_true", help="只测量导入耗时")
+    args = parser.parse_args()
+
+    measure_import(args.top)
+    if args.skip_requests:
+        return
+
+    arguments = json.loads(args.arguments)
+    print()
+    print("== 首个请求延迟 ==")
+    for warmup in (False, True):
+        runs = [
+            measure_first_request(args.tool, arguments, warmup, args.timeout)
+            for _ in range(args.runs)
+        ]
+        label = "启动预热" if warmup else "延迟初始化"
+        print(
+            f"{label}: 就绪 {statistics.median(r['ready_ms'] for r in runs):.0f} ms, "
+            f"首个请求 {statistics.median(r['first_ms'] for r in runs):.0f} ms, "
+            f"第二个请求 {statistics.median(r['second_ms'] for r in runs):.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
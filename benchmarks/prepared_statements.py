@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+预编译语句基准测试
+
+对比同一条股票资讯查询以普通参数化 SQL 执行和以预编译语句（EXECUTE）执行时：
+1. EXPLAIN ANALYZE 报告的 Planning Time（预编译语句切换到通用计划后应接近 0）
+2. 客户端测得的端到端延迟
+
+需要配置与生产相同的 POSTGRES_* 环境变量（或 DATA_SOURCES），默认连接第一个数据源。
+
+用法:
+    python benchmarks/prepared_statements.py
+    python benchmarks/prepared_statements.py --iterations 500 --days-back 3
+    python benchmarks/prepared_statements.py --source replica-1
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import psycopg2  # noqa: E402
+
+from config import settings  # noqa: E402
+from services.stock_service import connection_params  # noqa: E402
+from services.stock_statements import build_statements, prepare_all  # noqa: E402
+
+# PostgreSQL 在前 5 次执行使用定制计划，之后才可能切换到缓存的通用计划
+GENERIC_PLAN_WARMUP = 6
+
+
+def planning_time(cur, sql: str, params) -> float:
+    cur.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}", params)
+    return cur.fetchone()[0][0]["Planning Time"]
+
+
+def timed(cur, sql: str, params, iterations: int) -> list:
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        cur.execute(sql, params)
+        cur.fetchall()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="预编译语句基准测试")
+    parser.add_argument("--iterations", type=int, default=200, help="每种模式执行次数")
+    parser.add_argument("--days-back", type=int, default=7, help="查询的天数")
+    parser.add_argument("--page-size", type=int, default=50, help="每页条数")
+    parser.add_argument("--source", help="PostgreSQL 数据源名称（默认第一个）")
+    args = parser.parse_args()
+
+    sources = settings.data_sources("postgres")
+    if args.source:
+        sources = [source for source in sources if source["name"] == args.source]
+        if not sources:
+            parser.error(f"未配置数据源: {args.source}")
+
+    conn = psycopg2.connect(**connection_params(sources[0]))
+    conn.autocommit = True
+    statements = build_statements()
+
+    cases = [
+        ("stock_latest_trading_date", ()),
+        ("stock_news_page_first_full", (args.days_back, args.page_size + 1)),
+        ("stock_news_page_first_titles", (args.days_back, args.page_size + 1)),
+    ]
+
+    with conn.cursor() as cur:
+        cur.execute(f"SET search_path TO {settings.POSTGRES_SCHEMA}")
+        prepare_all(cur, statements)
+
+        print(f"{'语句':<32} {'模式':<8} {'Planning(ms)':>12} {'p50(ms)':>9} {'p95(ms)':>9}")
+        for name, params in cases:
+            statement = statements[name]
+            for _ in range(GENERIC_PLAN_WARMUP):
+                cur.execute(statement.execute_sql, params)
+                cur.fetchall()
+
+            for mode, sql in (("plain", statement.sql), ("prepared", statement.execute_sql)):
+                plan_ms = planning_time(cur, sql, params)
+                latencies = sorted(timed(cur, sql, params, args.iterations))
+                p95 = latencies[int(len(latencies) * 0.95) - 1]
+                print(f"{name:<32} {mode:<8} {plan_ms:>12.3f} {statistics.median(latencies):>9.2f} {p95:>9.2f}")
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+请求回放
+
+读取服务器录制的请求（MCP_RECORD_PATH，含轮转文件），按原始时间间隔或缩放后的
+速度发送到目标服务器，并按方法/工具统计延迟，与录制时的服务端耗时对比。
+
+录制耗时是服务端处理时间，回放延迟是客户端往返时间（含网络）；对比两次代码改动
+时，用 --save 保存一次回放结果，再用 --baseline 与之对比更准确。目标服务器应关闭
+限流（MCP_RATE_LIMIT_ENABLED=false），否则回放会被 429 截断。
+
+用法:
+    python benchmarks/replay.py /var/log/mcp/requests.jsonl
+    python benchmarks/replay.py requests.jsonl --url http://127.0.0.1:8080 --speed 4
+    python benchmarks/replay.py requests.jsonl --speed 0 --concurrency 32 --save before.json
+    python benchmarks/replay.py requests.jsonl --speed 0 --concurrency 32 --baseline before.json
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+
+def load_records(path: str, methods: Optional[List[str]]) -> List[dict]:
+    """读取录制文件及其轮转文件（path.1, path.2, ...），按时间排序"""
+    base = Path(path)
+    # 编号越大越旧，先读最旧的
+    backups = sorted(
+        (p for p in base.parent.glob(f"{base.name}.*") if p.suffix[1:].isdigit()),
+        key=lambda p: int(p.suffix[1:]),
+        reverse=True
+    )
+    files = backups + [base]
+
+    records = []
+    for file in files:
+        if not file.exists():
+            continue
+        with file.open(encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 进程退出时可能留下半行
+                    continue
+                if methods and record.get("method") not in methods:
+                    continue
+                records.append(record)
+
+    records.sort(key=lambda r: r["ts"])
+    return records
+
+
+def _label(record: dict) -> str:
+    return f"tools/call:{record['tool']}" if record.get("tool") else str(record.get("method"))
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def replay(records: List[dict], url: str, speed: float, concurrency: int, timeout: float) -> List[dict]:
+    """
+    回放请求；speed 为 1 时按原始节奏，2 时两倍速，0 时不等待、按并发上限尽快发送
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    results: List[dict] = []
+    first_ts = records[0]["ts"]
+    started = time.perf_counter()
+
+    async def send(client: httpx.AsyncClient, index: int, record: dict) -> None:
+        if speed > 0:
+            delay = (record["ts"] - first_ts) / speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        payload = {"jsonrpc": "2.0", "method": record["method"], "params": record.get("params") or {}, "id": index}
+        async with semaphore:
+            call_started = time.perf_counter()
+            try:
+                response = await client.post(f"{url}/mcp", json=payload)
+                status = response.status_code
+                size = len(response.content)
+            except httpx.HTTPError as e:
+                status, size = None, 0
+                print(f"请求失败: {_label(record)} {e!r}", file=sys.stderr)
+            results.append({
+                "label": _label(record),
+                "latency_ms": (time.perf_counter() - call_started) * 1000,
+                "recorded_ms": record.get("duration_ms"),
+                "status": status,
+                "recorded_status": record.get("status"),
+                "bytes": size,
+            })
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        await asyncio.gather(*(send(client, i, r) for i, r in enumerate(records)))
+    return results
+
+
+def summarize(results: List[dict]) -> Dict[str, dict]:
+    groups: Dict[str, List[dict]] = defaultdict(list)
+    for result in results:
+        groups[result["label"]].append(result)
+
+    summary = {}
+    for label, items in groups.items():
+        latencies = [r["latency_ms"] for r in items]
+        recorded = [r["recorded_ms"] for r in items if r["recorded_ms"] is not None]
+        summary[label] = {
+            "count": len(items),
+            "errors": sum(1 for r in items if r["status"] != r["recorded_status"]),
+            "p50_ms": statistics.median(latencies),
+            "p95_ms": _percentile(latencies, 95),
+            "recorded_p50_ms": statistics.median(recorded) if recorded else None,
+            "recorded_p95_ms": _percentile(recorded, 95) if recorded else None,
+            "avg_bytes": statistics.mean(r["bytes"] for r in items),
+        }
+    return summary
+
+
+def _delta(current: float, reference: Optional[float]) -> str:
+    if not reference:
+        return "-"
+    return f"{(current - reference) / reference * 100:+.0f}%"
+
+
+def print_report(summary: Dict[str, dict], baseline: Optional[Dict[str, dict]]) -> None:
+    reference_name = "基线" if baseline else "录制"
+    print(f"{'方法/工具':<40} {'次数':>6} {'状态不符':>8} {'p50':>9} {'p95':>9} "
+          f"{reference_name + 'p50':>9} {reference_name + 'p95':>9} {'Δp50':>7} {'Δp95':>7}")
+    for label in sorted(summary, key=lambda k: -summary[k]["count"]):
+        row = summary[label]
+        if baseline:
+            ref = baseline.get(label, {})
+            ref_p50, ref_p95 = ref.get("p50_ms"), ref.get("p95_ms")
+        else:
+            ref_p50, ref_p95 = row["recorded_p50_ms"], row["recorded_p95_ms"]
+        print(
+            f"{label:<40} {row['count']:>6} {row['errors']:>8} "
+            f"{row['p50_ms']:>7.1f}ms {row['p95_ms']:>7.1f}ms "
+            f"{(f'{ref_p50:.1f}ms' if ref_p50 is not None else '-'):>9} "
+            f"{(f'{ref_p95:.1f}ms' if ref_p95 is not None else '-'):>9} "
+            f"{_delta(row['p50_ms'], ref_p50):>7} {_delta(row['p95_ms'], ref_p95):>7}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回放录制的 MCP 请求")
+    parser.add_argument("record_file", help="录制文件路径（MCP_RECORD_PATH）")
+    parser.add_argument("--url", default="http://127.0.0.1:8080", help="目标服务器地址")
+    parser.add_argument("--speed", type=float, default=1.0, help="回放速度倍数，0 表示不等待尽快发送")
+    parser.add_argument("--concurrency", type=int, default=16, help="最大并发请求数")
+    parser.add_argument("--method", action="append", help="只回放指定方法（可重复），默认全部")
+    parser.add_argument("--limit", type=int, default=0, help="最多回放的请求数，0 表示全部")
+    parser.add_argument("--timeout", type=float, default=60.0, help="单个请求超时（秒）")
+    parser.add_argument("--save", help="把本次回放统计保存为 JSON")
+    parser.add_argument("--baseline", help="与之前 --save 保存的回放统计对比")
+    args = parser.parse_args()
+
+    records = load_records(args.record_file, args.method)
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        print("没有可回放的请求")
+        return
+
+    span = records[-1]["ts"] - records[0]["ts"]
+    print(f"回放 {len(records)} 个请求（录制时长 {span:.1f}s，速度 {args.speed or '不限'}）→ {args.url}")
+    started = time.perf_counter()
+    results = asyncio.run(replay(records, args.url.rstrip("/"), args.speed, args.concurrency, args.timeout))
+    print(f"回放完成，耗时 {time.perf_counter() - started:.1f}s")
+    print()
+
+    summary = summarize(results)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(summary, baseline)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"\n统计已保存到 {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
+import json
 import os
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 
 class Settings:
@@ -13,12 +14,25 @@ class Settings:
     PRODUCTS_TABLE: str = os.getenv("PRODUCTS_TABLE", "ph_products")
     REPORTS_TABLE: str = os.getenv("REPORTS_TABLE", "ph_daily_reports")
 
+    # 日报表中的 Markdown 正文字段（按章节获取时拆分）
+    REPORT_CONTENT_FIELD: str = os.getenv("REPORT_CONTENT_FIELD", "content")
+
+    # Product Hunt 产品表中用于分组统计的字段
+    PRODUCT_TOPICS_FIELD: str = os.getenv("PRODUCT_TOPICS_FIELD", "topics")
+    PRODUCT_MAKERS_FIELD: str = os.getenv("PRODUCT_MAKERS_FIELD", "makers")
+
     # GitHub Trending Supabase 配置
     GITHUB_SUPABASE_URL: str = os.getenv("GITHUB_SUPABASE_URL", "")
     GITHUB_SUPABASE_KEY: str = os.getenv("GITHUB_SUPABASE_KEY", "")
 
+    # Supabase (PostgREST) HTTP 请求超时（秒）
+    SUPABASE_TIMEOUT: float = float(os.getenv("SUPABASE_TIMEOUT", "10"))
+    # Supabase 查询专用的线程数，挂起的 HTTP 请求不会占满 PostgreSQL 查询和健康探测使用的默认线程池
+    SUPABASE_MAX_WORKERS: int = int(os.getenv("SUPABASE_MAX_WORKERS", "8"))
+
     # GitHub Trending 日报表名
     GITHUB_REPORTS_TABLE: str = os.getenv("GITHUB_REPORTS_TABLE", "github_trending_reports")
+    GITHUB_REPORT_CONTENT_FIELD: str = os.getenv("GITHUB_REPORT_CONTENT_FIELD", "content")
 
     # PostgreSQL 数据库配置（美股科技股票）
     POSTGRES_HOST: str = os.getenv("POSTGRES_HOST", "")
@@ -28,8 +42,59 @@ class Settings:
     POSTGRES_PASSWORD: str = os.getenv("POSTGRES_PASSWORD", "")
     POSTGRES_SCHEMA: str = os.getenv("POSTGRES_SCHEMA", "public")
 
+    # PostgreSQL 连接池大小
+    POSTGRES_POOL_MIN: int = int(os.getenv("POSTGRES_POOL_MIN", "1"))
+    POSTGRES_POOL_MAX: int = int(os.getenv("POSTGRES_POOL_MAX", "10"))
+
+    # PostgreSQL 建连（及等待连接池空闲连接）超时（秒）和兜底的语句超时（毫秒）
+    POSTGRES_CONNECT_TIMEOUT: int = int(os.getenv("POSTGRES_CONNECT_TIMEOUT", "5"))
+    POSTGRES_STATEMENT_TIMEOUT_MS: int = int(os.getenv("POSTGRES_STATEMENT_TIMEOUT_MS", "30000"))
+
+    # 是否在每个连接上使用服务端预编译语句（经过 transaction 模式的 pgbouncer 时需关闭）
+    POSTGRES_PREPARED_STATEMENTS: bool = os.getenv("POSTGRES_PREPARED_STATEMENTS", "true").lower() == "true"
+
     # 股票数据表名
     STOCK_TABLE: str = os.getenv("STOCK_TABLE", "text_messages")
 
+    # 多数据源（区域镜像、只读副本），JSON，按类型（ph / github / postgres）列出数据源，例如:
+    # {"ph": [{"name": "us", "url": "...", "key": "..."}, {"name": "eu", "url": "...", "key": "..."}],
+    #  "postgres": [{"name": "primary"}, {"name": "replica-1", "host": "10.0.0.2"}]}
+    # 数据源中未给出的字段沿用上面的单一数据源配置；未列出的类型只使用单一数据源
+    DATA_SOURCES: str = os.getenv("DATA_SOURCES", "")
+
+    # 数据源连续失败多少次后暂停路由，以及暂停时长（秒）
+    DATA_SOURCE_FAILURE_THRESHOLD: int = int(os.getenv("DATA_SOURCE_FAILURE_THRESHOLD", "2"))
+    DATA_SOURCE_COOLDOWN: float = float(os.getenv("DATA_SOURCE_COOLDOWN", "30"))
+    # 单个数据源的探测超时（秒），需小于后端探测超时 MCP_PROBE_TIMEOUT，
+    # 否则一个无响应的数据源会使整个后端探测超时
+    DATA_SOURCE_PROBE_TIMEOUT: float = float(os.getenv("DATA_SOURCE_PROBE_TIMEOUT", "3"))
+
+    def data_sources(self, kind: str) -> List[Dict[str, Any]]:
+        """
+        某类数据源的配置列表（至少包含一个）
+
+        Args:
+            kind: ph（Product Hunt Supabase）、github（GitHub Trending Supabase）或 postgres
+        """
+        defaults: Dict[str, Dict[str, Any]] = {
+            "ph": {"url": self.SUPABASE_URL, "key": self.SUPABASE_KEY},
+            "github": {"url": self.GITHUB_SUPABASE_URL, "key": self.GITHUB_SUPABASE_KEY},
+            "postgres": {
+                "host": self.POSTGRES_HOST,
+                "port": int(self.POSTGRES_PORT),
+                "dbname": self.POSTGRES_DB,
+                "user": self.POSTGRES_USER,
+                "password": self.POSTGRES_PASSWORD,
+            },
+        }
+        base = defaults[kind]
+        configured = json.loads(self.DATA_SOURCES).get(kind) if self.DATA_SOURCES else None
+        if not configured:
+            return [{"name": "default", **base}]
+        return [
+            {**base, "name": f"{kind}-{i}", **source}
+            for i, source in enumerate(configured)
+        ]
+
 
 settings = Settings()
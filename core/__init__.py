@@ -0,0 +1 @@
+# Core server components
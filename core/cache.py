@@ -0,0 +1,338 @@
+"""
+工具结果两级缓存
+
+L1 为进程内缓存；L2 为可选的 Redis 协议共享缓存（Redis、KeyDB、Valkey 或任何
+兼容 RESP 的本地替身均可），值为序列化后的 JSON 字节并带 TTL。
+同一个 key 的未命中会合并：进程内用 single-flight，实例之间用 L2 上的
+SET NX 锁，整个集群对每个 key 大约只产生一次后端查询。
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+
+class RespError(Exception):
+    """Redis 协议错误响应"""
+
+
+class RespConnection:
+    """单个 RESP2 连接，一次只执行一条命令"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @staticmethod
+    def _encode(args: Tuple[Any, ...]) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    async def _read_reply(self) -> Any:
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("连接已关闭")
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b"+":
+            return payload.decode("utf-8")
+        if prefix == b"-":
+            raise RespError(payload.decode("utf-8"))
+        if prefix == b":":
+            return int(payload)
+        if prefix == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = await self.reader.readexactly(length + 2)
+            return data[:-2]
+        if prefix == b"*":
+            count = int(payload)
+            if count < 0:
+                return None
+            return [await self._read_reply() for _ in range(count)]
+        raise RespError(f"无法解析的响应: {line!r}")
+
+    async def execute(self, *args: Any) -> Any:
+        self.writer.write(self._encode(args))
+        await self.writer.drain()
+        return await self._read_reply()
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class RespClient:
+    """
+    最小的 Redis 协议客户端（连接池）
+
+    Args:
+        url: redis://[:password@]host[:port][/db]
+        max_connections: 最大连接数
+        timeout: 建连和单条命令超时（秒）
+    """
+
+    def __init__(self, url: str, max_connections: int = 10, timeout: float = 0.5):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._idle: List[RespConnection] = []
+        self._slots = asyncio.Semaphore(max_connections)
+
+    async def _connect(self) -> RespConnection:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        conn = RespConnection(reader, writer)
+        try:
+            if self.password:
+                await conn.execute("AUTH", self.password)
+            if self.db:
+                await conn.execute("SELECT", self.db)
+        except BaseException:
+            # 认证或选库失败时关闭连接，不放回连接池
+            conn.close()
+            raise
+        return conn
+
+    async def execute(self, *args: Any) -> Any:
+        """执行一条命令；出错时关闭该连接，错误向上抛出"""
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else None
+            try:
+                if conn is None:
+                    conn = await asyncio.wait_for(self._connect(), timeout=self.timeout)
+                reply = await asyncio.wait_for(conn.execute(*args), timeout=self.timeout)
+            except RespError:
+                # 命令错误不影响连接本身；建连阶段的错误（conn 为 None）已在 _connect 中关闭连接
+                if conn is not None:
+                    self._idle.append(conn)
+                raise
+            except BaseException:
+                if conn is not None:
+                    conn.close()
+                raise
+            self._idle.append(conn)
+            return reply
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.execute("GET", key)
+
+    async def set(self, key: str, value: bytes, ttl_ms: int, nx: bool = False) -> bool:
+        args: List[Any] = ["SET", key, value, "PX", max(1, ttl_ms)]
+        if nx:
+            args.append("NX")
+        return await self.execute(*args) == "OK"
+
+    async def delete(self, key: str) -> None:
+        await self.execute("DEL", key)
+
+    async def exists(self, key: str) -> bool:
+        return await self.execute("EXISTS", key) == 1
+
+    async def close(self) -> None:
+        for conn in self._idle:
+            conn.close()
+        self._idle.clear()
+
+
+class ResultCache:
+    """
+    两级结果缓存
+
+    Args:
+        l1_max_entries: 进程内缓存的最大条目数（LRU 淘汰）
+        l2: 共享缓存客户端，None 表示只使用 L1
+        namespace: L2 key 前缀
+        lock_ttl: L2 上合并未命中的锁超时（秒），也是等待其他实例结果的最长时间
+    """
+
+    # L2 出错后暂停使用的时间（秒），期间只使用 L1
+    L2_BACKOFF_SECONDS = 30
+    # 等待其他实例填充结果时的轮询间隔（秒）
+    LOCK_POLL_INTERVAL = 0.05
+
+    def __init__(
+        self,
+        l1_max_entries: int = 1000,
+        l2: Optional[RespClient] = None,
+        namespace: str = "ph-mcp:v1",
+        lock_ttl: float = 10.0
+    ):
+        self.l1_max_entries = l1_max_entries
+        self.l2 = l2
+        self.namespace = namespace
+        self.lock_ttl = lock_ttl
+        # key -> (过期时间, 值)
+        self._l1: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._l2_down_until = 0.0
+        self._stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0, "coalesced": 0, "l2_errors": 0}
+
+    def _l1_get(self, key: str) -> Any:
+        entry = self._l1.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._l1[key]
+            return None
+        self._l1.move_to_end(key)
+        return entry[1]
+
+    def _l1_set(self, key: str, value: Any, ttl: float) -> None:
+        self._l1[key] = (time.monotonic() + ttl, value)
+        self._l1.move_to_end(key)
+        while len(self._l1) > self.l1_max_entries:
+            self._l1.popitem(last=False)
+
+    def _l2_available(self) -> bool:
+        return self.l2 is not None and time.monotonic() >= self._l2_down_until
+
+    def _l2_failed(self, e: BaseException) -> None:
+        self._stats["l2_errors"] += 1
+        self._l2_down_until = time.monotonic() + self.L2_BACKOFF_SECONDS
+        logger.warning("共享缓存不可用，%ss 内只使用进程内缓存: %r", self.L2_BACKOFF_SECONDS, e)
+
+    async def _l2_call(self, coro: Awaitable[Any]) -> Tuple[bool, Any]:
+        """执行 L2 操作，返回 (是否成功, 结果)"""
+        try:
+            return True, await coro
+        except (OSError, asyncio.TimeoutError, RespError, asyncio.IncompleteReadError) as e:
+            self._l2_failed(e)
+            return False, None
+
+    async def get_or_compute(
+        self,
+        key: str,
+        ttl: float,
+        compute: Callable[[], Awaitable[Any]],
+        should_cache: Callable[[Any], bool] = lambda value: True,
+        max_wait: Optional[float] = None
+    ) -> Any:
+        """
+        读取缓存，未命中时调用 compute 计算并写入两级缓存
+
+        值需要可以 JSON 序列化；should_cache 返回 False 的结果（如错误结果）不缓存。
+        max_wait 限制等待其他实例计算结果的时间（如调用方剩余的超时时间），
+        默认最多等待 lock_ttl。
+        """
+        value = self._l1_get(key)
+        if value is not None:
+            self._stats["l1_hits"] += 1
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._stats["coalesced"] += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # 发起计算的请求被取消（如客户端断开）时，其余等待者自行重新计算
+                if not inflight.cancelled():
+                    raise
+                return await self.get_or_compute(key, ttl, compute, should_cache, max_wait)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._load(key, ttl, compute, should_cache, max_wait)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有其他等待者时取走异常，避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            del self._inflight[key]
+
+    async def _load(self, key: str, ttl: float, compute, should_cache, max_wait: Optional[float]) -> Any:
+        if not self._l2_available():
+            return await self._compute(key, ttl, compute, should_cache)
+
+        l2_key = f"{self.namespace}:{key}"
+        ok, raw = await self._l2_call(self.l2.get(l2_key))
+        if ok and raw is not None:
+            self._stats["l2_hits"] += 1
+            value = json.loads(raw)
+            self._l1_set(key, value, ttl)
+            return value
+        if not ok:
+            return await self._compute(key, ttl, compute, should_cache)
+
+        # 其他实例可能正在计算同一个 key：拿不到锁时等待其结果写入 L2
+        lock_key = f"{l2_key}:lock"
+        ok, locked = await self._l2_call(self.l2.set(lock_key, b"1", int(self.lock_ttl * 1000), nx=True))
+        if ok and not locked:
+            wait = self.lock_ttl if max_wait is None else min(self.lock_ttl, max_wait)
+            value = await self._wait_for_other(key, l2_key, lock_key, ttl, time.monotonic() + wait)
+            if value is not None:
+                return value
+
+        try:
+            return await self._compute(key, ttl, compute, should_cache, l2_key=l2_key)
+        finally:
+            if ok and locked:
+                await self._l2_call(self.l2.delete(lock_key))
+
+    async def _wait_for_other(self, key: str, l2_key: str, lock_key: str, ttl: float, deadline: float) -> Any:
+        """
+        轮询其他实例写入 L2 的结果
+
+        锁已释放但没有结果（结果不可缓存、计算超时或实例崩溃后锁过期）时立即停止等待，
+        由调用方自行计算；返回 None 表示没有等到结果。
+        """
+        held = True
+        while held and time.monotonic() < deadline:
+            await asyncio.sleep(self.LOCK_POLL_INTERVAL)
+            ok, held = await self._l2_call(self.l2.exists(lock_key))
+            if not ok:
+                return None
+            # 先检查锁再读取结果：持有者先写结果后释放锁，锁已释放时这次读取能看到结果
+            ok, raw = await self._l2_call(self.l2.get(l2_key))
+            if not ok:
+                return None
+            if raw is not None:
+                self._stats["coalesced"] += 1
+                value = json.loads(raw)
+                self._l1_set(key, value, ttl)
+                return value
+        return None
+
+    async def _compute(self, key: str, ttl: float, compute, should_cache, l2_key: Optional[str] = None) -> Any:
+        self._stats["misses"] += 1
+        value = await compute()
+        if should_cache(value):
+            self._l1_set(key, value, ttl)
+            if l2_key is not None and self._l2_available():
+                raw = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                await self._l2_call(self.l2.set(l2_key, raw, int(ttl * 1000)))
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存命中统计"""
+        return {
+            "l1_entries": len(self._l1),
+            "l1_capacity": self.l1_max_entries,
+            "l2_enabled": self.l2 is not None,
+            "l2_available": self._l2_available() if self.l2 is not None else False,
+            **self._stats
+        }
+
+    async def close(self) -> None:
+        if self.l2 is not None:
+            await self.l2.close()
@@ -0,0 +1,40 @@
+"""
+请求截止时间
+
+execute_tool 按工具超时设置截止时间（contextvar，随任务传递到工具内的查询），
+服务层据此跳过已经没有意义的后端调用，例如在线程池中排队时调用方已经超时。
+"""
+
+import contextvars
+import time
+from typing import Optional
+
+# 截止时间（time.monotonic），None 表示没有限制
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """调用方的截止时间已过"""
+
+
+def set_deadline(deadline: float) -> contextvars.Token:
+    return _deadline.set(deadline)
+
+
+def reset_deadline(token: contextvars.Token) -> None:
+    _deadline.reset(token)
+
+
+def current_deadline() -> Optional[float]:
+    return _deadline.get()
+
+
+def check_deadline(deadline: Optional[float]) -> None:
+    """
+    截止时间已过时抛出异常（可在工作线程中调用，deadline 由调用方在事件循环中读取）
+
+    Raises:
+        DeadlineExceeded: 截止时间已过
+    """
+    if deadline is not None and time.monotonic() >= deadline:
+        raise DeadlineExceeded("请求已超时")
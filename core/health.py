@@ -0,0 +1,134 @@
+"""
+后端健康探测
+
+后台任务按固定间隔对每个后端执行一次最小查询，并缓存结果。
+就绪探针只读取缓存的结果，不会因为探针请求本身给后端带来额外负载。
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BackendStatus:
+    """单个后端最近一次探测的结果"""
+
+    __slots__ = ("healthy", "latency_ms", "checked_at", "error", "consecutive_failures")
+
+    def __init__(self):
+        self.healthy = False
+        self.latency_ms: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.consecutive_failures = 0
+
+    def to_dict(self, now: float) -> Dict[str, Any]:
+        return {
+            "status": "ok" if self.healthy else ("unknown" if self.checked_at is None else "down"),
+            "latency_ms": self.latency_ms,
+            "age_seconds": round(now - self.checked_at, 1) if self.checked_at is not None else None,
+            "consecutive_failures": self.consecutive_failures,
+            "error": self.error,
+        }
+
+
+class BackendProber:
+    """
+    周期性后端探测
+
+    Args:
+        interval: 探测间隔（秒）
+        timeout: 单次探测超时（秒）
+        failure_threshold: 连续失败多少次后判定为不健康，避免偶发失败导致抖动
+    """
+
+    def __init__(self, interval: float, timeout: float, failure_threshold: int = 2):
+        self.interval = interval
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self._checks: Dict[str, Callable[[], None]] = {}
+        self._status: Dict[str, BackendStatus] = {}
+        # 仍在线程中执行的探测（超时后不会被中断），避免在同一后端上堆积线程
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def add_check(self, name: str, check: Callable[[], None]) -> None:
+        """注册同步探测函数（在线程中执行，抛出异常即视为失败）"""
+        self._checks[name] = check
+        self._status[name] = BackendStatus()
+
+    async def _probe(self, name: str) -> None:
+        status = self._status[name]
+        started = time.perf_counter()
+        try:
+            inflight = self._inflight.get(name)
+            if inflight is not None and not inflight.done():
+                raise TimeoutError("上一次探测仍未返回")
+            inflight = asyncio.get_running_loop().run_in_executor(None, self._checks[name])
+            # 超时后仍需取走线程中的异常，避免 "exception was never retrieved" 警告
+            inflight.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._inflight[name] = inflight
+            await asyncio.wait_for(asyncio.shield(inflight), timeout=self.timeout)
+        except Exception as e:
+            status.consecutive_failures += 1
+            status.error = str(e) or type(e).__name__
+            status.latency_ms = None
+            # 首次探测没有历史状态，失败即判定为不健康
+            if status.checked_at is None or status.consecutive_failures >= self.failure_threshold:
+                if status.healthy or status.checked_at is None:
+                    logger.warning("后端 %s 探测失败: %s", name, status.error)
+                status.healthy = False
+        else:
+            if not status.healthy and status.checked_at is not None:
+                logger.info("后端 %s 已恢复", name)
+            status.healthy = True
+            status.error = None
+            status.consecutive_failures = 0
+            status.latency_ms = round((time.perf_counter() - started) * 1000, 1)
+        status.checked_at = time.monotonic()
+
+    async def probe_once(self) -> None:
+        """并行探测所有后端"""
+        await asyncio.gather(*(self._probe(name) for name in self._checks))
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.probe_once()
+            except Exception as e:
+                logger.error("后端探测出错: %s", e)
+
+    def start(self) -> None:
+        """启动后台探测任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台探测任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def is_healthy(self, names: Iterable[str]) -> bool:
+        """指定后端是否都健康，且结果没有过期（超过 3 个探测间隔视为过期）"""
+        now = time.monotonic()
+        for name in names:
+            status = self._status.get(name)
+            if status is None or not status.healthy:
+                return False
+            if status.checked_at is None or now - status.checked_at > self.interval * 3 + self.timeout:
+                return False
+        return True
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """各后端的最近探测结果"""
+        now = time.monotonic()
+        return {name: status.to_dict(now) for name, status in self._status.items()}
@@ -0,0 +1,147 @@
+"""
+日志管道
+
+- 异步输出：请求路径上的 logger 调用只把 LogRecord 放入有界队列，
+  格式化和写 stdout 在后台线程中完成；队列满时丢弃并计数，不阻塞请求
+- 延迟格式化：记录以 %-格式 + 参数的形式入队，只有通过级别和采样过滤的
+  记录才会在后台线程中格式化
+- 请求上下文：每个请求分配 request_id（或沿用 X-Request-ID），同一请求中
+  所有日志都带上该 id
+- 采样：请求中的 INFO 及以下日志按请求采样（同一请求的日志要么全部保留、
+  要么全部丢弃），WARNING 及以上和请求之外的日志始终保留
+- 格式：text（与之前相同的单行格式）或 json（每行一个 JSON 对象）
+"""
+
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# (request_id, 本请求的 INFO 日志是否被采样保留)
+_request_context: contextvars.ContextVar[Optional[Tuple[str, bool]]] = contextvars.ContextVar(
+    "request_context", default=None
+)
+
+# 沿用客户端传入的 X-Request-ID 时只接受安全字符，避免日志注入
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+_sample_rate = 1.0
+_dropped = 0
+
+
+def bind_request(request_id: Optional[str] = None) -> contextvars.Token:
+    """在当前上下文（及之后创建的任务）中绑定请求 id，并决定是否采样本请求的日志"""
+    if not request_id or not _VALID_REQUEST_ID.match(request_id):
+        request_id = uuid.uuid4().hex[:12]
+    sampled = _sample_rate >= 1.0 or random.random() < _sample_rate
+    return _request_context.set((request_id, sampled))
+
+
+def unbind_request(token: contextvars.Token) -> None:
+    _request_context.reset(token)
+
+
+def current_request_id() -> Optional[str]:
+    context = _request_context.get()
+    return context[0] if context else None
+
+
+class RequestContextFilter(logging.Filter):
+    """附加 request_id，并丢弃未被采样的请求中的常规日志（在调用方线程中执行）"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _request_context.get()
+        if context is None:
+            record.request_id = None
+            return True
+        record.request_id = context[0]
+        return context[1] or record.levelno >= logging.WARNING
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出一行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """原有的单行文本格式，请求中的日志在末尾附加 request_id"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        request_id = getattr(record, "request_id", None)
+        return f"{line} [rid={request_id}]" if request_id else line
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """进程内队列：不在调用方线程中格式化消息，队列满时丢弃"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        global _dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _dropped += 1
+
+
+def setup_logging(
+    level: str = "INFO",
+    fmt: str = "text",
+    sample_rate: float = 1.0,
+    queue_size: int = 10000
+) -> logging.handlers.QueueListener:
+    """
+    配置根 logger，返回已启动的后台输出线程（关闭时调用 stop() 写完剩余日志）
+
+    Args:
+        level: 日志级别
+        fmt: text 或 json
+        sample_rate: 请求中 INFO 日志的采样率（0~1）
+        queue_size: 日志队列长度
+    """
+    global _sample_rate
+    _sample_rate = sample_rate
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter(TEXT_FORMAT))
+
+    handler = _NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+
+    listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=False)
+    listener.start()
+    return listener
+
+
+def log_stats() -> Dict[str, Any]:
+    return {"sample_rate": _sample_rate, "dropped": _dropped}
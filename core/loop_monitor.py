@@ -0,0 +1,169 @@
+"""
+事件循环延迟监控
+
+LoopLagMonitor 后台任务按固定间隔 sleep，实际唤醒时间与预期的差值即调度延迟，
+保留最近一段时间的样本供就绪探针输出。
+
+BlockingDetector（调试用，默认关闭）在独立线程中定期向事件循环投递一个回调，
+回调超过阈值仍未执行说明循环被阻塞，此时对事件循环线程的调用栈采样，
+阻塞结束后记录阻塞时长和出现次数最多的调用栈，定位在 async 函数中执行的同步调用。
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """
+    周期性采样事件循环调度延迟
+
+    Args:
+        interval: 采样间隔（秒）
+        window: 保留的样本数量
+    """
+
+    def __init__(self, interval: float = 0.5, window: int = 120):
+        self.interval = interval
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._max_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (loop.time() - started - self.interval) * 1000)
+            self._samples.append(lag_ms)
+            self._max_ms = max(self._max_ms, lag_ms)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """最近窗口内的调度延迟（毫秒）"""
+        samples = sorted(self._samples)
+        if not samples:
+            return {"samples": 0}
+        return {
+            "samples": len(samples),
+            "window_seconds": round(len(samples) * self.interval, 1),
+            "current_ms": round(self._samples[-1], 2),
+            "avg_ms": round(sum(samples) / len(samples), 2),
+            "p99_ms": round(samples[max(0, -(-len(samples) * 99 // 100) - 1)], 2),
+            "max_ms": round(samples[-1], 2),
+            "max_since_start_ms": round(self._max_ms, 2),
+        }
+
+
+class BlockingDetector:
+    """
+    检测阻塞事件循环超过阈值的回调并采样调用栈
+
+    Args:
+        threshold: 阻塞阈值（秒）
+        max_events: 保留的最近阻塞事件数量
+    """
+
+    # 单次阻塞最多采样的调用栈数量
+    MAX_SAMPLES_PER_EVENT = 50
+
+    def __init__(self, threshold: float = 0.1, max_events: int = 20):
+        self.threshold = threshold
+        self._events: Deque[Dict[str, Any]] = deque(maxlen=max_events)
+        self._blocked_count = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """在事件循环中调用，启动检测线程"""
+        if self._thread is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-blocking-detector", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=self.threshold * 2 + 1)
+            self._thread = None
+
+    def _sample_stack(self) -> Optional[str]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        # 调用栈从外到内，只保留文件名、行号和函数名，便于合并相同位置的样本
+        return ";".join(
+            f"{entry.name} ({entry.filename.rsplit('/', 1)[-1]}:{entry.lineno})"
+            for entry in traceback.extract_stack(frame)
+        )
+
+    def _watch(self) -> None:
+        while not self._stop.is_set():
+            executed = threading.Event()
+            sent_at = time.perf_counter()
+            try:
+                self._loop.call_soon_threadsafe(executed.set)
+            except RuntimeError:
+                # 事件循环已关闭
+                return
+
+            if executed.wait(self.threshold):
+                self._stop.wait(self.threshold)
+                continue
+
+            # 回调未在阈值内执行：持续采样直到循环恢复
+            stacks: List[str] = []
+            while not executed.is_set() and not self._stop.is_set():
+                if len(stacks) < self.MAX_SAMPLES_PER_EVENT:
+                    stack = self._sample_stack()
+                    if stack:
+                        stacks.append(stack)
+                executed.wait(self.threshold / 2)
+            self._record(time.perf_counter() - sent_at, stacks)
+
+    def _record(self, duration: float, stacks: List[str]) -> None:
+        self._blocked_count += 1
+        counts = Counter(stacks)
+        top_stack, hits = counts.most_common(1)[0] if counts else ("", 0)
+        self._events.append({
+            "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "duration_ms": round(duration * 1000, 1),
+            "samples": len(stacks),
+            "stack": top_stack,
+            "stack_hits": hits,
+        })
+        logger.warning(
+            "事件循环被阻塞 %.0fms，最常见的调用栈（%s/%s 次采样）:\n  %s",
+            duration * 1000, hits, len(stacks), "\n  ".join(top_stack.split(";")[-12:])
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "threshold_ms": round(self.threshold * 1000),
+            "blocked_count": self._blocked_count,
+            "recent": list(self._events),
+        }
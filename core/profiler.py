@@ -0,0 +1,102 @@
+"""
+采样 CPU 分析
+
+在独立线程中按固定频率读取所有线程的调用栈（sys._current_frames），
+按调用栈聚合采样次数，输出 flamegraph.pl / speedscope 可以直接读取的
+collapsed stack 格式（"线程;外层函数;...;内层函数 次数"）。
+
+只在分析期间有开销，且开销由采样频率和时长上限约束；同一时间只允许
+一次分析。
+"""
+
+import math
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Tuple
+
+# 采样时长和频率上限，限制生产环境中的开销
+MAX_PROFILE_SECONDS = 60.0
+MAX_PROFILE_HZ = 250
+
+
+class ProfilerBusy(Exception):
+    """已有分析正在进行"""
+
+
+def _frame_label(code) -> str:
+    # 用函数首行号而不是当前行号，同一函数的样本合并为一个节点
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """对当前进程的所有线程做定时采样"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def profile(self, seconds: float, hz: int) -> Tuple[str, Dict[str, float]]:
+        """
+        同步采样 seconds 秒（在线程中调用）
+
+        Returns:
+            (collapsed stack 文本, 采样统计)
+
+        Raises:
+            ValueError: seconds 不是有限的数字（NaN 会使采样永不结束）
+            ProfilerBusy: 已有分析正在进行
+        """
+        if not math.isfinite(seconds):
+            raise ValueError("seconds 必须是有限的数字")
+        seconds = min(max(seconds, 0.1), MAX_PROFILE_SECONDS)
+        hz = min(max(hz, 1), MAX_PROFILE_HZ)
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("已有分析正在进行")
+
+        try:
+            stacks: Counter = Counter()
+            interval = 1.0 / hz
+            own_id = threading.get_ident()
+            labels: Dict = {}
+            samples = 0
+            started = time.perf_counter()
+            deadline = started + seconds
+            next_at = started
+
+            while True:
+                now = time.perf_counter()
+                if now >= deadline:
+                    break
+                if now < next_at:
+                    time.sleep(next_at - now)
+                next_at += interval
+
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_id:
+                        continue
+                    frames = []
+                    while frame is not None:
+                        code = frame.f_code
+                        label = labels.get(code)
+                        if label is None:
+                            label = labels[code] = _frame_label(code)
+                        frames.append(label)
+                        frame = frame.f_back
+                    frames.append(names.get(thread_id, f"thread-{thread_id}"))
+                    stacks[";".join(reversed(frames))] += 1
+                samples += 1
+
+            elapsed = time.perf_counter() - started
+        finally:
+            self._lock.release()
+
+        collapsed = "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+        return collapsed + "\n", {
+            "seconds": round(elapsed, 2),
+            "hz": hz,
+            "samples": samples,
+            "stacks": len(stacks),
+        }
@@ -0,0 +1,222 @@
+"""
+令牌桶限流
+
+按客户端（已配置的 API Key 或 IP）维护令牌桶，每次请求按工具成本扣减令牌。
+桶状态默认保存在进程内存中；多 worker / 多实例部署时使用 RespBackend，
+桶保存在 Redis 协议的共享服务中，所有 worker 共用同一份配额。
+"""
+
+import abc
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Collection, Dict, List, Optional, Tuple
+
+from core.cache import RespClient, RespError
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitBackend(abc.ABC):
+    """限流状态后端接口"""
+
+    @abc.abstractmethod
+    async def consume(self, key: str, cost: float, capacity: float, refill_rate: float) -> Tuple[bool, float, float]:
+        """
+        尝试从 key 对应的令牌桶中扣减 cost 个令牌
+
+        Returns:
+            (是否允许, 剩余令牌数, 需要等待的秒数)
+        """
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryBackend(RateLimitBackend):
+    """进程内令牌桶，只在单个 worker 内生效"""
+
+    # 超过该数量后清理已经回满（等价于不存在）的桶
+    MAX_BUCKETS = 10000
+
+    def __init__(self):
+        # key -> [令牌数, 上次更新时间]
+        self._buckets: Dict[str, List[float]] = {}
+
+    async def consume(self, key: str, cost: float, capacity: float, refill_rate: float) -> Tuple[bool, float, float]:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.MAX_BUCKETS:
+                self._prune(now, capacity, refill_rate)
+            bucket = self._buckets[key] = [capacity, now]
+
+        tokens = min(capacity, bucket[0] + (now - bucket[1]) * refill_rate)
+        bucket[1] = now
+
+        if tokens >= cost:
+            bucket[0] = tokens - cost
+            return True, bucket[0], 0.0
+
+        bucket[0] = tokens
+        return False, tokens, (cost - tokens) / refill_rate
+
+    def _prune(self, now: float, capacity: float, refill_rate: float) -> None:
+        full = [
+            key for key, (tokens, updated) in self._buckets.items()
+            if tokens + (now - updated) * refill_rate >= capacity
+        ]
+        for key in full:
+            del self._buckets[key]
+
+
+# 在服务端原子地完成补充和扣减；桶在回满所需时间后过期，空闲客户端不占用内存
+_CONSUME_SCRIPT = """
+local cost = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local rate = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1])
+local ts = tonumber(bucket[2])
+if tokens == nil or ts == nil then
+  tokens = capacity
+  ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RespBackend(RateLimitBackend):
+    """
+    Redis 协议共享令牌桶，多个 worker / 实例共用配额
+
+    Args:
+        client: RESP 客户端
+        namespace: key 前缀
+
+    共享服务不可用时在 BACKOFF_SECONDS 内退回进程内令牌桶，不拒绝请求。
+    """
+
+    BACKOFF_SECONDS = 30
+
+    def __init__(self, client: RespClient, namespace: str = "ph-mcp:ratelimit"):
+        self.client = client
+        self.namespace = namespace
+        self.fallback = MemoryBackend()
+        self._sha = hashlib.sha1(_CONSUME_SCRIPT.encode("utf-8")).hexdigest()
+        self._down_until = 0.0
+
+    async def _eval(self, key: str, *args) -> List:
+        try:
+            return await self.client.execute("EVALSHA", self._sha, 1, key, *args)
+        except RespError as e:
+            if not str(e).startswith("NOSCRIPT"):
+                raise
+        # 脚本尚未缓存（首次调用或服务重启），EVAL 会同时缓存脚本
+        return await self.client.execute("EVAL", _CONSUME_SCRIPT, 1, key, *args)
+
+    async def consume(self, key: str, cost: float, capacity: float, refill_rate: float) -> Tuple[bool, float, float]:
+        if time.monotonic() < self._down_until:
+            return await self.fallback.consume(key, cost, capacity, refill_rate)
+        try:
+            allowed, tokens = await self._eval(
+                f"{self.namespace}:{key}", repr(cost), repr(capacity), repr(refill_rate), repr(time.time())
+            )
+        except (OSError, asyncio.TimeoutError, RespError, asyncio.IncompleteReadError) as e:
+            self._down_until = time.monotonic() + self.BACKOFF_SECONDS
+            logger.warning("共享限流后端不可用，%ss 内使用进程内令牌桶: %r", self.BACKOFF_SECONDS, e)
+            return await self.fallback.consume(key, cost, capacity, refill_rate)
+
+        tokens = float(tokens)
+        if allowed:
+            return True, tokens, 0.0
+        return False, tokens, (cost - tokens) / refill_rate
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+class RateLimitExceeded(Exception):
+    """请求超出客户端配额"""
+
+    def __init__(self, client: str, cost: float, retry_after: float):
+        super().__init__(f"Rate limit exceeded for {client}")
+        self.client = client
+        self.cost = cost
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """按客户端标识限流，capacity 为突发上限，refill_rate 为每秒恢复的令牌数"""
+
+    def __init__(self, capacity: float, refill_rate: float, backend: Optional[RateLimitBackend] = None):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.backend = backend or MemoryBackend()
+
+    async def check(self, client: str, cost: float) -> float:
+        """
+        扣减客户端配额
+
+        Returns:
+            剩余令牌数
+
+        Raises:
+            RateLimitExceeded: 配额不足
+        """
+        if cost > self.capacity:
+            cost = self.capacity
+        allowed, remaining, retry_after = await self.backend.consume(
+            client, cost, self.capacity, self.refill_rate
+        )
+        if not allowed:
+            raise RateLimitExceeded(client, cost, retry_after)
+        return remaining
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+
+def client_identity(
+    headers,
+    client_host: Optional[str],
+    trust_forwarded: bool = False,
+    api_keys: Collection[str] = (),
+    trusted_hops: int = 1
+) -> str:
+    """
+    计算请求的客户端标识
+
+    带有 api_keys 中某个 Key（Authorization: Bearer 或 X-API-Key）时按 Key 计算
+    （只保存哈希）；其他 Key 不可信，客户端可以每次换一个来绕过限流，
+    因此与未带 Key 一样使用客户端 IP。
+
+    trust_forwarded 时从 X-Forwarded-For 取客户端 IP：每层代理把它看到的来源地址
+    追加到末尾，左侧的地址由客户端随意填写，因此取倒数第 trusted_hops 个
+    （trusted_hops 为本服务前可信代理的层数）；地址数量不足时使用连接的来源地址。
+    """
+    if api_keys:
+        api_key = headers.get("x-api-key")
+        if not api_key:
+            authorization = headers.get("authorization", "")
+            if authorization[:7].lower() == "bearer ":
+                api_key = authorization[7:].strip()
+        if api_key and api_key in api_keys:
+            return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+    if trust_forwarded:
+        forwarded = [item.strip() for item in headers.get("x-forwarded-for", "").split(",") if item.strip()]
+        if trusted_hops > 0 and len(forwarded) >= trusted_hops:
+            return "ip:" + forwarded[-trusted_hops]
+
+    return "ip:" + (client_host or "unknown")
@@ -0,0 +1,99 @@
+"""
+请求录制
+
+按采样率把 JSON-RPC 请求（方法、工具、参数、耗时、响应大小）以 JSON Lines
+格式写入本地文件，文件按大小轮转。写文件在后台线程中完成，请求路径上只有
+一次入队操作。录制文件可以用 benchmarks/replay.py 回放。
+"""
+
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import time
+from typing import Any, Dict
+
+
+class RequestRecorder:
+    """采样录制 JSON-RPC 请求到轮转文件"""
+
+    def __init__(
+        self,
+        path: str,
+        sample_rate: float = 1.0,
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 5
+    ):
+        self.path = path
+        self.sample_rate = sample_rate
+        self._recorded = 0
+        self._dropped = 0
+
+        # 借用 logging 的队列和轮转实现：请求路径只入队，后台线程负责写入和轮转
+        self._queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=10000)
+        file_handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True
+        )
+        file_handler.setFormatter(logging.Formatter("%(message)s"))
+        self._listener = logging.handlers.QueueListener(self._queue, file_handler)
+        self._started = False
+
+    def start(self) -> None:
+        if not self._started:
+            self._listener.start()
+            self._started = True
+
+    def stop(self) -> None:
+        """停止后台线程，写完队列中剩余的记录"""
+        if self._started:
+            self._listener.stop()
+            self._started = False
+
+    def sampled(self) -> bool:
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def record(
+        self,
+        body: Dict[str, Any],
+        status_code: int,
+        duration_ms: float,
+        response_bytes: int
+    ) -> None:
+        """
+        记录一次请求
+
+        Args:
+            body: 原始 JSON-RPC 请求体
+            status_code: HTTP 状态码
+            duration_ms: 服务端处理耗时（毫秒）
+            response_bytes: 响应体字节数
+        """
+        params = body.get("params") or {}
+        entry = {
+            "ts": round(time.time(), 6),
+            "method": body.get("method"),
+            "tool": params.get("name") if body.get("method") == "tools/call" else None,
+            "params": params,
+            "status": status_code,
+            "duration_ms": round(duration_ms, 3),
+            "response_bytes": response_bytes,
+        }
+        record = logging.LogRecord(
+            "recorder", logging.INFO, "", 0, json.dumps(entry, ensure_ascii=False), None, None
+        )
+        try:
+            self._queue.put_nowait(record)
+            self._recorded += 1
+        except queue.Full:
+            # 磁盘跟不上时丢弃录制，不阻塞请求
+            self._dropped += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "sample_rate": self.sample_rate,
+            "recorded": self._recorded,
+            "dropped": self._dropped,
+        }
+
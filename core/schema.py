@@ -0,0 +1,181 @@
+"""
+JSON Schema 参数校验
+
+启动时把工具的 inputSchema 编译成嵌套的校验闭包，请求时只做直接的
+类型/范围比较，不再解释 schema 字典。只支持 TOOLS 中用到的子集：
+type、properties、required、additionalProperties、enum、pattern、format(date)、
+minLength/maxLength、minimum/maximum、items、minItems/maxItems、uniqueItems。
+"""
+
+import re
+from datetime import date
+from typing import Any, Callable, Dict, List
+
+Validator = Callable[[Any, str], None]
+
+
+class SchemaValidationError(ValueError):
+    """参数不符合 schema"""
+
+
+_TYPE_CHECKS: Dict[str, Callable[[Any], bool]] = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, str),
+    # bool 是 int 的子类，需要单独排除
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "null": lambda v: v is None,
+}
+
+
+def _is_date(value: str) -> bool:
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+_FORMAT_CHECKS: Dict[str, Callable[[str], bool]] = {
+    "date": _is_date,
+}
+
+
+def _compile(schema: Dict[str, Any]) -> Validator:
+    checks: List[Validator] = []
+
+    schema_type = schema.get("type")
+    if schema_type is not None:
+        type_check = _TYPE_CHECKS[schema_type]
+
+        def check_type(value: Any, path: str) -> None:
+            if not type_check(value):
+                raise SchemaValidationError(f"{path} 应为 {schema_type} 类型")
+
+        checks.append(check_type)
+
+    if "enum" in schema:
+        allowed = list(schema["enum"])
+
+        def check_enum(value: Any, path: str) -> None:
+            if value not in allowed:
+                raise SchemaValidationError(f"{path} 取值必须是 {allowed} 之一")
+
+        checks.append(check_enum)
+
+    if "pattern" in schema:
+        regex = re.compile(schema["pattern"])
+
+        def check_pattern(value: Any, path: str) -> None:
+            if isinstance(value, str) and not regex.search(value):
+                raise SchemaValidationError(f"{path} 格式不正确")
+
+        checks.append(check_pattern)
+
+    if "format" in schema and schema["format"] in _FORMAT_CHECKS:
+        fmt = schema["format"]
+        format_check = _FORMAT_CHECKS[fmt]
+
+        def check_format(value: Any, path: str) -> None:
+            if isinstance(value, str) and not format_check(value):
+                raise SchemaValidationError(f"{path} 不是合法的 {fmt}")
+
+        checks.append(check_format)
+
+    if "minLength" in schema or "maxLength" in schema:
+        min_length = schema.get("minLength", 0)
+        max_length = schema.get("maxLength")
+
+        def check_length(value: Any, path: str) -> None:
+            if not isinstance(value, str):
+                return
+            if len(value) < min_length:
+                raise SchemaValidationError(f"{path} 长度不能小于 {min_length}")
+            if max_length is not None and len(value) > max_length:
+                raise SchemaValidationError(f"{path} 长度不能大于 {max_length}")
+
+        checks.append(check_length)
+
+    if "minimum" in schema or "maximum" in schema:
+        minimum = schema.get("minimum")
+        maximum = schema.get("maximum")
+
+        def check_range(value: Any, path: str) -> None:
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                return
+            if minimum is not None and value < minimum:
+                raise SchemaValidationError(f"{path} 不能小于 {minimum}")
+            if maximum is not None and value > maximum:
+                raise SchemaValidationError(f"{path} 不能大于 {maximum}")
+
+        checks.append(check_range)
+
+    if "items" in schema or "minItems" in schema or "maxItems" in schema or schema.get("uniqueItems"):
+        item_validator = _compile(schema["items"]) if "items" in schema else None
+        min_items = schema.get("minItems", 0)
+        max_items = schema.get("maxItems")
+        unique = schema.get("uniqueItems", False)
+
+        def check_array(value: Any, path: str) -> None:
+            if not isinstance(value, list):
+                return
+            if len(value) < min_items:
+                raise SchemaValidationError(f"{path} 至少需要 {min_items} 项")
+            if max_items is not None and len(value) > max_items:
+                raise SchemaValidationError(f"{path} 最多允许 {max_items} 项")
+            if item_validator is not None:
+                for index, item in enumerate(value):
+                    item_validator(item, f"{path}[{index}]")
+            if unique and len(set(map(repr, value))) != len(value):
+                raise SchemaValidationError(f"{path} 中存在重复项")
+
+        checks.append(check_array)
+
+    if "properties" in schema or "required" in schema or "additionalProperties" in schema:
+        property_validators = {
+            key: _compile(prop)
+            for key, prop in schema.get("properties", {}).items()
+        }
+        required = tuple(schema.get("required", ()))
+        allow_additional = schema.get("additionalProperties", True) is not False
+
+        def check_object(value: Any, path: str) -> None:
+            if not isinstance(value, dict):
+                return
+            missing = [key for key in required if key not in value]
+            if missing:
+                raise SchemaValidationError(f"缺少必需参数: {', '.join(missing)}")
+            for key, item in value.items():
+                validator = property_validators.get(key)
+                if validator is not None:
+                    validator(item, key if path == "arguments" else f"{path}.{key}")
+                elif not allow_additional:
+                    raise SchemaValidationError(f"不支持的参数: {key}")
+
+        checks.append(check_object)
+
+    if len(checks) == 1:
+        return checks[0]
+
+    def check_all(value: Any, path: str) -> None:
+        for check in checks:
+            check(value, path)
+
+    return check_all
+
+
+def compile_schema(schema: Dict[str, Any]) -> Callable[[Any], None]:
+    """
+    编译 schema 为校验函数
+
+    Returns:
+        校验函数，参数不合法时抛出 SchemaValidationError
+    """
+    validator = _compile(schema)
+
+    def validate(value: Any) -> None:
+        validator(value, "arguments")
+
+    return validate
@@ -8,42 +8,124 @@ Product Hunt MCP Server (HTTP Mode)
 运行模式：HTTP JSON-RPC，监听在 8080 端口
 """
 
+import asyncio
+import atexit
+import hashlib
+import hmac
 import json
 import logging
+import math
 import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from typing import Any, Optional, Dict
+from typing import Any, Awaitable, Callable, Optional, Dict, List
 
-import uvicorn
 from starlette.applications import Starlette
 from starlette.routing import Route
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, Response
 from starlette.requests import Request
 
+from config import settings
 from services.supabase_service import SupabaseService
-from services.stock_service import StockService
+from services.stock_service import StockService, decode_cursor
+from services.rollup_service import RollupService
+from services.report_sections import select_sections
+from core.schema import SchemaValidationError, compile_schema
+from core.cache import ResultCache, RespClient
+from core.deadline import reset_deadline, set_deadline
+from core.health import BackendProber
+from core.rate_limit import RateLimiter, RateLimitExceeded, RespBackend, client_identity
+from core.recorder import RequestRecorder
+from core.loop_monitor import BlockingDetector, LoopLagMonitor
+from core.profiler import ProfilerBusy, SamplingProfiler
+from core.logs import bind_request, current_request_id, log_stats, setup_logging, unbind_request
 
 # 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# 日志：后台线程输出，请求中的 INFO 日志按请求采样
+log_listener = setup_logging(
+    level=os.getenv("MCP_LOG_LEVEL", "INFO"),
+    fmt=os.getenv("MCP_LOG_FORMAT", "text"),
+    sample_rate=float(os.getenv("MCP_LOG_SAMPLE_RATE", "1")),
+    queue_size=int(os.getenv("MCP_LOG_QUEUE_SIZE", "10000"))
 )
+atexit.register(log_listener.stop)
 logger = logging.getLogger(__name__)
 
+STARTED_AT = time.monotonic()
+
 # 配置
 PORT = int(os.getenv("MCP_SERVER_PORT", "8080"))
 HOST = os.getenv("MCP_SERVER_HOST", "0.0.0.0")
+# 工具默认执行超时（秒），超时后取消工具及其后端查询
+DEFAULT_TOOL_TIMEOUT = float(os.getenv("MCP_TOOL_TIMEOUT", "15"))
+# 按工具覆盖注册表中的超时，格式: "search_products=5,get_product_stats=20"
+TOOL_TIMEOUT_OVERRIDES = {
+    name.strip(): float(value)
+    for name, _, value in (
+        item.partition("=") for item in os.getenv("MCP_TOOL_TIMEOUTS", "").split(",") if "=" in item
+    )
+}
+# 工具结果缓存：进程内条目上限，以及可选的共享缓存地址（redis://[:password@]host:port/db）
+CACHE_L1_MAX_ENTRIES = int(os.getenv("MCP_CACHE_L1_MAX_ENTRIES", "1000"))
+CACHE_REDIS_URL = os.getenv("MCP_CACHE_REDIS_URL", "")
+# 启动时是否预热后端连接
+WARMUP_ENABLED = os.getenv("MCP_WARMUP_ENABLED", "true").lower() == "true"
+# 后台后端探测间隔和单次超时（秒）
+PROBE_INTERVAL = float(os.getenv("MCP_PROBE_INTERVAL", "15"))
+PROBE_TIMEOUT = float(os.getenv("MCP_PROBE_TIMEOUT", "5"))
+# 就绪探针要求健康的后端
+READY_BACKENDS = tuple(
+    name.strip()
+    for name in os.getenv("MCP_READY_BACKENDS", "supabase,supabase_github,postgres").split(",")
+    if name.strip()
+)
+# 限流：每个客户端的令牌桶容量（突发上限）和每秒恢复的令牌数
+RATE_LIMIT_ENABLED = os.getenv("MCP_RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_CAPACITY = float(os.getenv("MCP_RATE_LIMIT_CAPACITY", "60"))
+RATE_LIMIT_REFILL = float(os.getenv("MCP_RATE_LIMIT_REFILL", "1"))
+# 部署在反向代理之后时，按 X-Forwarded-For 识别客户端 IP
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("MCP_RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+# 本服务前可信反向代理的层数（客户端 IP 取 X-Forwarded-For 的倒数第几个地址）
+RATE_LIMIT_TRUSTED_HOPS = int(os.getenv("MCP_RATE_LIMIT_TRUSTED_HOPS", "1"))
+# 多 worker / 多实例共享配额时的限流后端地址（redis://[:password@]host:port/db），为空时每个进程单独计算
+RATE_LIMIT_REDIS_URL = os.getenv("MCP_RATE_LIMIT_REDIS_URL", "")
+# 按 Key 限流的 API Key（逗号分隔）；其他 Key 按客户端 IP 限流
+RATE_LIMIT_API_KEYS = frozenset(
+    key.strip() for key in os.getenv("MCP_API_KEYS", "").split(",") if key.strip()
+)
+
+# 事件循环延迟采样间隔（秒）；阻塞检测（调试用）及其阈值
+LOOP_MONITOR_INTERVAL = float(os.getenv("MCP_LOOP_MONITOR_INTERVAL", "0.5"))
+BLOCKING_DETECTOR_ENABLED = os.getenv("MCP_BLOCKING_DETECTOR", "false").lower() == "true"
+BLOCKING_THRESHOLD_MS = float(os.getenv("MCP_BLOCKING_THRESHOLD_MS", "100"))
+
+# 管理接口令牌（Authorization: Bearer <token>），为空时不启用管理接口
+ADMIN_TOKEN = os.getenv("MCP_ADMIN_TOKEN", "")
+
+# 请求录制（用于回放压测），路径为空时不启用
+RECORD_PATH = os.getenv("MCP_RECORD_PATH", "")
+RECORD_SAMPLE_RATE = float(os.getenv("MCP_RECORD_SAMPLE_RATE", "1"))
+RECORD_MAX_BYTES = int(os.getenv("MCP_RECORD_MAX_BYTES", str(10 * 1024 * 1024)))
+RECORD_BACKUPS = int(os.getenv("MCP_RECORD_BACKUPS", "5"))
 
 # 初始化服务
 db_service: Optional[SupabaseService] = None
 stock_service: Optional[StockService] = None
+rollup_service: Optional[RollupService] = None
+# 启动预热在线程中创建服务，与请求路径上的延迟初始化互斥
+_service_lock = threading.Lock()
 
 
 def get_db_service():
     """获取数据库服务实例（延迟初始化）"""
     global db_service
     if db_service is None:
-        db_service = SupabaseService()
+        with _service_lock:
+            if db_service is None:
+                db_service = SupabaseService()
     return db_service
 
 
@@ -51,10 +133,49 @@ def get_stock_service():
     """获取股票服务实例（延迟初始化）"""
     global stock_service
     if stock_service is None:
-        stock_service = StockService()
+        with _service_lock:
+            if stock_service is None:
+                stock_service = StockService()
     return stock_service
 
 
+def get_rollup_service():
+    """获取汇总统计服务实例（延迟初始化）"""
+    global rollup_service
+    if rollup_service is None:
+        rollup_service = RollupService(get_db_service())
+    return rollup_service
+
+
+# 批量日期查询最多覆盖的天数
+MAX_DATES_PER_QUERY = 31
+# 统计工具最多覆盖的天数
+MAX_STATS_DAYS = 90
+
+# 日报工具的字段投影和章节参数
+REPORT_FIELDS_SCHEMA = {
+    "type": "array",
+    "description": "只返回这些字段（列名），例如 [\"report_date\", \"summary\"]。不提供则返回全部字段；包含不存在的字段时返回参数错误",
+    "items": {
+        "type": "string",
+        "pattern": "^[A-Za-z_][A-Za-z0-9_]*$"
+    },
+    "minItems": 1,
+    "maxItems": 20,
+    "uniqueItems": True
+}
+REPORT_SECTIONS_SCHEMA = {
+    "type": "array",
+    "description": "只返回标题包含这些关键词的正文章节（不区分大小写），正文字段替换为 sections，并在 available_sections 中列出全部章节标题",
+    "items": {
+        "type": "string",
+        "minLength": 1,
+        "maxLength": 100
+    },
+    "minItems": 1,
+    "maxItems": 20
+}
+
 # MCP 工具定义
 TOOLS = [
     {
@@ -88,7 +209,8 @@ TOOLS = [
                 "date": {
                     "type": "string",
                     "description": "日期，格式为 YYYY-MM-DD，例如：2024-03-15",
-                    "pattern": "^\\d{4}-\\d{2}-\\d{2}$"
+                    "pattern": "^\\d{4}-\\d{2}-\\d{2}$",
+                    "format": "date"
                 },
                 "limit": {
                     "type": "integer",
@@ -101,6 +223,86 @@ TOOLS = [
             "required": ["date"]
         }
     },
+    {
+        "name": "get_products_by_dates",
+        "description": "批量获取多个日期的 Product Hunt 产品列表，每天按排名返回前 N 个。可以传入日期列表 dates，或通过 start_date 和 end_date 指定日期范围（最多 31 天）。返回数据只包含中文内容（tagline_cn, description_cn）。",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "dates": {
+                    "type": "array",
+                    "description": "日期列表，格式为 YYYY-MM-DD，例如：[\"2024-03-15\", \"2024-03-16\"]",
+                    "items": {
+                        "type": "string",
+                        "pattern": "^\\d{4}-\\d{2}-\\d{2}$",
+                        "format": "date"
+                    },
+                    "minItems": 1,
+                    "maxItems": MAX_DATES_PER_QUERY,
+                    "uniqueItems": True
+                },
+                "start_date": {
+                    "type": "string",
+                    "description": "开始日期，格式为 YYYY-MM-DD（与 end_date 一起使用，替代 dates）",
+                    "pattern": "^\\d{4}-\\d{2}-\\d{2}$",
+                    "format": "date"
+                },
+                "end_date": {
+                    "type": "string",
+                    "description": "结束日期，格式为 YYYY-MM-DD（与 start_date 一起使用，替代 dates）",
+                    "pattern": "^\\d{4}-\\d{2}-\\d{2}$",
+                    "format": "date"
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "每天返回的产品数量",
+                    "default": 10,
+                    "minimum": 1,
+                    "maximum": 100
+                }
+            }
+        }
+    },
+    {
+        "name": "get_product_stats",
+        "description": "获取 Product Hunt 产品的汇总统计（产品数量、投票总数、平均值和 P50/P90/P99 分位数），可按天、话题（topic）或制作者（maker）分组。只返回统计结果，不返回产品列表。默认统计最近 30 天，也可以通过 start_date 和 end_date 指定日期范围（最多 90 天）。",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "days": {
+                    "type": "integer",
+                    "description": "统计最近多少天的数据（包含今天），默认为 30 天",
+                    "default": 30,
+                    "minimum": 1,
+                    "maximum": MAX_STATS_DAYS
+                },
+                "start_date": {
+                    "type": "string",
+                    "description": "开始日期，格式为 YYYY-MM-DD（与 end_date 一起使用，替代 days）",
+                    "pattern": "^\\d{4}-\\d{2}-\\d{2}$",
+                    "format": "date"
+                },
+                "end_date": {
+                    "type": "string",
+                    "description": "结束日期，格式为 YYYY-MM-DD（与 start_date 一起使用，替代 days）",
+                    "pattern": "^\\d{4}-\\d{2}-\\d{2}$",
+                    "format": "date"
+                },
+                "group_by": {
+                    "type": "string",
+                    "description": "分组维度：day（按天）、topic（按话题）、maker（按制作者）。不提供则只返回总体统计",
+                    "enum": ["day", "topic", "maker"]
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "按 topic/maker 分组时返回产品数量最多的前 N 组",
+                    "default": 20,
+                    "minimum": 1,
+                    "maximum": 100
+                }
+            }
+        }
+    },
     {
         "name": "search_products",
         "description": "搜索 Product Hunt 产品。支持中英文关键词搜索，返回数据只包含中文内容（tagline_cn, description_cn）。",
@@ -109,7 +311,9 @@ TOOLS = [
             "properties": {
                 "keyword": {
                     "type": "string",
-                    "description": "搜索关键词（中英文均可），会在产品名称、标语、描述及中文翻译中搜索"
+                    "description": "搜索关键词（中英文均可），会在产品名称、标语、描述及中文翻译中搜索",
+                    "minLength": 1,
+                    "maxLength": 100
                 },
                 "days": {
                     "type": "integer",
@@ -131,14 +335,33 @@ TOOLS = [
     },
     {
         "name": "get_top_products",
-        "description": "获取指定日期投票数最多的热门产品。返回数据只包含中文内容（tagline_cn, description_cn）。",
+        "description": "获取投票数最多的热门产品。默认为指定日期（date，默认今天），也可以用 days 统计最近若干天，或用 start_date 和 end_date 指定日期范围（最多 90 天），返回整个范围内票数最高的产品。返回数据只包含中文内容（tagline_cn, description_cn）。",
         "inputSchema": {
             "type": "object",
             "properties": {
                 "date": {
                     "type": "string",
                     "description": "日期，格式为 YYYY-MM-DD。如果不提供，默认为今天",
-                    "pattern": "^\\d{4}-\\d{2}-\\d{2}$"
+                    "pattern": "^\\d{4}-\\d{2}-\\d{2}$",
+                    "format": "date"
+                },
+                "days": {
+                    "type": "integer",
+                    "description": "最近多少天（包含今天）内的热门产品，例如 7 表示本周、30 表示本月（替代 date）",
+                    "minimum": 1,
+                    "maximum": MAX_STATS_DAYS
+                },
+                "start_date": {
+                    "type": "string",
+                    "description": "开始日期，格式为 YYYY-MM-DD（与 end_date 一起使用，替代 date）",
+                    "pattern": "^\\d{4}-\\d{2}-\\d{2}$",
+                    "format": "date"
+                },
+                "end_date": {
+                    "type": "string",
+                    "description": "结束日期，格式为 YYYY-MM-DD（与 start_date 一起使用，替代 date）",
+                    "pattern": "^\\d{4}-\\d{2}-\\d{2}$",
+                    "format": "date"
                 },
                 "limit": {
                     "type": "integer",
@@ -152,23 +375,29 @@ TOOLS = [
     },
     {
         "name": "get_latest_report",
-        "description": "获取最新的 Product Hunt 每日报告。报告包含产品分析和趋势总结。",
+        "description": "获取最新的 Product Hunt 每日报告。报告包含产品分析和趋势总结。可以用 fields 只获取部分字段，用 sections 只获取正文中的部分章节。",
         "inputSchema": {
             "type": "object",
-            "properties": {}
+            "properties": {
+                "fields": REPORT_FIELDS_SCHEMA,
+                "sections": REPORT_SECTIONS_SCHEMA
+            }
         }
     },
     {
         "name": "get_report_by_date",
-        "description": "根据指定日期获取 Product Hunt 每日报告。日期格式为 YYYY-MM-DD",
+        "description": "根据指定日期获取 Product Hunt 每日报告。日期格式为 YYYY-MM-DD。可以用 fields 只获取部分字段，用 sections 只获取正文中的部分章节。",
         "inputSchema": {
             "type": "object",
             "properties": {
                 "date": {
                     "type": "string",
                     "description": "日期，格式为 YYYY-MM-DD，例如：2024-03-15",
-                    "pattern": "^\\d{4}-\\d{2}-\\d{2}$"
-                }
+                    "pattern": "^\\d{4}-\\d{2}-\\d{2}$",
+                    "format": "date"
+                },
+                "fields": REPORT_FIELDS_SCHEMA,
+                "sections": REPORT_SECTIONS_SCHEMA
             },
             "required": ["date"]
         }
@@ -182,12 +411,14 @@ TOOLS = [
                 "start_date": {
                     "type": "string",
                     "description": "开始日期，格式为 YYYY-MM-DD",
-                    "pattern": "^\\d{4}-\\d{2}-\\d{2}$"
+                    "pattern": "^\\d{4}-\\d{2}-\\d{2}$",
+                    "format": "date"
                 },
                 "end_date": {
                     "type": "string",
                     "description": "结束日期，格式为 YYYY-MM-DD",
-                    "pattern": "^\\d{4}-\\d{2}-\\d{2}$"
+                    "pattern": "^\\d{4}-\\d{2}-\\d{2}$",
+                    "format": "date"
                 }
             },
             "required": ["start_date", "end_date"]
@@ -195,24 +426,100 @@ TOOLS = [
     },
     {
         "name": "get_github_trending_report",
-        "description": "获取 GitHub Trending 日报。可以指定日期获取特定日期的日报，不指定则返回最新日报。",
+        "description": "获取 GitHub Trending 日报。可以指定日期获取特定日期的日报，不指定则返回最新日报。可以用 fields 只获取部分字段，用 sections 只获取正文中的部分章节。",
         "inputSchema": {
             "type": "object",
             "properties": {
                 "date": {
                     "type": "string",
                     "description": "日期，格式为 YYYY-MM-DD。如果不提供，返回最新日报",
-                    "pattern": "^\\d{4}-\\d{2}-\\d{2}$"
-                }
+                    "pattern": "^\\d{4}-\\d{2}-\\d{2}$",
+                    "format": "date"
+                },
+                "fields": REPORT_FIELDS_SCHEMA,
+                "sections": REPORT_SECTIONS_SCHEMA
             }
         }
     },
     {
         "name": "get_latest_stock_news",
-        "description": "获取最新的美股科技股票资讯。自动处理周末不开盘的情况，返回最近交易日的股票新闻。",
+        "description": "获取最新的美股科技股票资讯。自动处理周末不开盘的情况，返回最近交易日的股票新闻。结果包含 next_cursor，之后传入 since 参数即可只获取新增的资讯（适合盘中轮询）；include_content 为 false 时只返回标题，正文可通过 get_stock_news_content 按 id 获取。",
         "inputSchema": {
             "type": "object",
-            "properties": {}
+            "properties": {
+                "since": {
+                    "type": "string",
+                    "description": "增量游标（上一次结果中的 next_cursor），只返回该游标之后的新资讯",
+                    "minLength": 1,
+                    "maxLength": 200
+                },
+                "include_content": {
+                    "type": "boolean",
+                    "description": "是否返回资讯正文，默认为 true；为 false 时只返回标题、来源和时间",
+                    "default": True
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "增量模式（传入 since）下最多返回的条数，超出时 has_more 为 true",
+                    "default": 100,
+                    "minimum": 1,
+                    "maximum": 500
+                }
+            }
+        }
+    },
+    {
+        "name": "get_stock_news_page",
+        "description": "分页获取最近若干天的美股科技股票资讯（按时间从新到旧）。第一页不传 cursor，之后传入上一页返回的 next_cursor 获取下一页，next_cursor 为 null 表示没有更多数据。",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "days_back": {
+                    "type": "integer",
+                    "description": "向前查找的天数，默认为 7 天",
+                    "default": 7,
+                    "minimum": 1,
+                    "maximum": 30
+                },
+                "page_size": {
+                    "type": "integer",
+                    "description": "每页条数，默认为 50",
+                    "default": 50,
+                    "minimum": 1,
+                    "maximum": 200
+                },
+                "cursor": {
+                    "type": "string",
+                    "description": "分页游标（上一页结果中的 next_cursor）",
+                    "minLength": 1,
+                    "maxLength": 200
+                },
+                "include_content": {
+                    "type": "boolean",
+                    "description": "是否返回资讯正文，默认为 true",
+                    "default": True
+                }
+            }
+        }
+    },
+    {
+        "name": "get_stock_news_content",
+        "description": "根据资讯 id 获取美股科技股票资讯的正文，配合 get_latest_stock_news 的 include_content=false 使用。",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "ids": {
+                    "type": "array",
+                    "description": "资讯 id 列表",
+                    "items": {
+                        "type": "integer"
+                    },
+                    "minItems": 1,
+                    "maxItems": 50,
+                    "uniqueItems": True
+                }
+            },
+            "required": ["ids"]
         }
     }
 ]
@@ -230,285 +537,805 @@ def filter_product_fields(products: list) -> list:
     return filtered
 
 
-async def execute_tool(name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
-    """执行工具调用"""
-    db = get_db_service()
+def text_result(text: str, is_error: bool = False) -> Dict[str, Any]:
+    """构造文本类型的工具结果"""
+    result: Dict[str, Any] = {
+        "content": [{
+            "type": "text",
+            "text": text
+        }]
+    }
+    if is_error:
+        result["isError"] = True
+    return result
+
+
+def json_result(data: Any) -> Dict[str, Any]:
+    """构造 JSON 文本类型的工具结果"""
+    return text_result(json.dumps(data, ensure_ascii=False, indent=2))
+
+
+# ============================================================
+# 工具注册表
+# ============================================================
+
+class InvalidToolArguments(ValueError):
+    """工具参数不合法"""
+
+
+ToolHandler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+@dataclass
+class ToolSpec:
+    """已注册工具的描述：处理函数、输入 schema 以及执行选项"""
+
+    name: str
+    handler: ToolHandler
+    input_schema: Dict[str, Any]
+    validator: Callable[[Any], None]
+    cacheable: bool = False
+    ttl: float = 0
+    timeout: float = DEFAULT_TOOL_TIMEOUT
+    cost: float = 1
+    # 传入其中任一参数的调用不使用结果缓存（如轮询游标，结果需要实时）
+    uncached_arguments: List[str] = field(default_factory=list)
+    defaults: Dict[str, Any] = field(default_factory=dict)
+
+    def prepare_arguments(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """按编译好的 schema 校验参数并填充默认值，在任何 I/O 之前执行"""
+        try:
+            self.validator(arguments)
+        except SchemaValidationError as e:
+            raise InvalidToolArguments(str(e)) from None
+
+        if not self.defaults:
+            return arguments
+        prepared = dict(self.defaults)
+        prepared.update(arguments)
+        return prepared
+
+
+_TOOL_SCHEMAS: Dict[str, Dict[str, Any]] = {tool["name"]: tool["inputSchema"] for tool in TOOLS}
+TOOL_REGISTRY: Dict[str, ToolSpec] = {}
+
+
+def register_tool(
+    name: str,
+    *,
+    cacheable: bool = False,
+    ttl: float = 0,
+    timeout: float = DEFAULT_TOOL_TIMEOUT,
+    cost: float = 1,
+    uncached_arguments: Optional[List[str]] = None
+) -> Callable[[ToolHandler], ToolHandler]:
+    """注册工具处理函数，schema 取自 TOOLS 中的同名定义"""
+    schema = _TOOL_SCHEMAS[name]
+    properties = schema.get("properties", {})
+
+    def decorator(handler: ToolHandler) -> ToolHandler:
+        TOOL_REGISTRY[name] = ToolSpec(
+            name=name,
+            handler=handler,
+            input_schema=schema,
+            validator=compile_schema(schema),
+            cacheable=cacheable,
+            ttl=ttl,
+            timeout=TOOL_TIMEOUT_OVERRIDES.get(name, timeout),
+            cost=cost,
+            uncached_arguments=list(uncached_arguments or []),
+            defaults={
+                key: prop["default"]
+                for key, prop in properties.items()
+                if "default" in prop
+            }
+        )
+        return handler
 
-    try:
-        if name == "get_latest_products":
-            days_ago = arguments.get("days_ago", 0)
-            limit = arguments.get("limit", 50)
-
-            products = await db.get_latest_products(days_ago=days_ago)
-
-            if not products:
-                target_date = datetime.now() - timedelta(days=days_ago)
-                return {
-                    "content": [{
-                        "type": "text",
-                        "text": f"未找到 {target_date.strftime('%Y-%m-%d')} 的产品数据"
-                    }]
-                }
+    return decorator
 
-            products = products[:limit]
-            products = filter_product_fields(products)
-            result = {
-                "date": products[0].get("fetch_date", "").split("T")[0] if products else "",
-                "total_count": len(products),
-                "products": products
-            }
 
-            return {
-                "content": [{
-                    "type": "text",
-                    "text": json.dumps(result, ensure_ascii=False, indent=2)
-                }]
-            }
+# 可缓存工具的两级结果缓存（L1 进程内，L2 可选的 Redis 协议共享缓存）
+result_cache = ResultCache(
+    l1_max_entries=CACHE_L1_MAX_ENTRIES,
+    l2=RespClient(CACHE_REDIS_URL) if CACHE_REDIS_URL else None
+)
 
-        elif name == "get_products_by_date":
-            date = arguments["date"]
-            limit = arguments.get("limit", 50)
 
-            products = await db.get_products_by_date(date=date)
+def _cache_key(name: str, arguments: Dict[str, Any]) -> str:
+    digest = hashlib.sha1(
+        json.dumps(arguments, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+    return f"tool:{name}:{digest}"
 
-            if not products:
-                return {
-                    "content": [{
-                        "type": "text",
-                        "text": f"未找到 {date} 的产品数据"
-                    }]
-                }
 
-            products = products[:limit]
-            products = filter_product_fields(products)
-            result = {
-                "date": date,
-                "total_count": len(products),
-                "products": products
-            }
+# ============================================================
+# 工具实现
+# ============================================================
 
-            return {
-                "content": [{
-                    "type": "text",
-                    "text": json.dumps(result, ensure_ascii=False, indent=2)
-                }]
-            }
+@register_tool("get_latest_products", cacheable=True, ttl=300)
+async def _get_latest_products(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    days_ago = arguments["days_ago"]
+    limit = arguments["limit"]
 
-        elif name == "search_products":
-            keyword = arguments["keyword"]
-            days = arguments.get("days", 7)
-            limit = arguments.get("limit", 20)
-
-            products = await db.search_products(
-                keyword=keyword,
-                days=days,
-                limit=limit
-            )
-
-            if not products:
-                return {
-                    "content": [{
-                        "type": "text",
-                        "text": f"未找到包含关键词 '{keyword}' 的产品（最近 {days} 天）"
-                    }]
-                }
+    products = await get_db_service().get_latest_products(days_ago=days_ago)
 
-            products = filter_product_fields(products)
-            result = {
-                "keyword": keyword,
-                "days": days,
-                "total_count": len(products),
-                "products": products
-            }
+    if not products:
+        target_date = datetime.now() - timedelta(days=days_ago)
+        return text_result(f"未找到 {target_date.strftime('%Y-%m-%d')} 的产品数据")
 
-            return {
-                "content": [{
-                    "type": "text",
-                    "text": json.dumps(result, ensure_ascii=False, indent=2)
-                }]
-            }
+    products = products[:limit]
+    products = filter_product_fields(products)
+    return json_result({
+        "date": products[0].get("fetch_date", "").split("T")[0] if products else "",
+        "total_count": len(products),
+        "products": products
+    })
 
-        elif name == "get_top_products":
-            date = arguments.get("date", datetime.now().strftime('%Y-%m-%d'))
-            limit = arguments.get("limit", 10)
-
-            products = await db.get_top_products_by_votes(
-                date=date,
-                limit=limit
-            )
-
-            if not products:
-                return {
-                    "content": [{
-                        "type": "text",
-                        "text": f"未找到 {date} 的产品数据"
-                    }]
-                }
 
-            products = filter_product_fields(products)
-            result = {
-                "date": date,
-                "total_count": len(products),
-                "products": products
-            }
+@register_tool("get_products_by_date", cacheable=True, ttl=600)
+async def _get_products_by_date(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    date = arguments["date"]
+    limit = arguments["limit"]
 
-            return {
-                "content": [{
-                    "type": "text",
-                    "text": json.dumps(result, ensure_ascii=False, indent=2)
-                }]
-            }
+    products = await get_db_service().get_products_by_date(date=date)
 
-        elif name == "get_latest_report":
-            report = await db.get_latest_report()
+    if not products:
+        return text_result(f"未找到 {date} 的产品数据")
 
-            if not report:
-                return {
-                    "content": [{
-                        "type": "text",
-                        "text": "未找到任何报告"
-                    }]
-                }
+    products = products[:limit]
+    products = filter_product_fields(products)
+    return json_result({
+        "date": date,
+        "total_count": len(products),
+        "products": products
+    })
 
-            return {
-                "content": [{
-                    "type": "text",
-                    "text": json.dumps(report, ensure_ascii=False, indent=2)
-                }]
-            }
 
-        elif name == "get_report_by_date":
-            date = arguments["date"]
+def _date_range(start_date: str, end_date: str, max_days: int) -> List[str]:
+    """展开 [start_date, end_date] 为日期列表，并限制范围长度"""
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    end = datetime.strptime(end_date, '%Y-%m-%d')
+    if start > end:
+        raise InvalidToolArguments("start_date 不能晚于 end_date")
 
-            report = await db.get_report_by_date(date=date)
+    days = (end - start).days + 1
+    if days > max_days:
+        raise InvalidToolArguments(f"日期范围不能超过 {max_days} 天")
 
-            if not report:
-                return {
-                    "content": [{
-                        "type": "text",
-                        "text": f"未找到 {date} 的报告"
-                    }]
-                }
+    return [(start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)]
 
-            return {
-                "content": [{
-                    "type": "text",
-                    "text": json.dumps(report, ensure_ascii=False, indent=2)
-                }]
-            }
 
-        elif name == "get_reports_by_date_range":
-            start_date = arguments["start_date"]
-            end_date = arguments["end_date"]
-
-            reports = await db.get_reports_by_date_range(
-                start_date=start_date,
-                end_date=end_date
-            )
-
-            if not reports:
-                return {
-                    "content": [{
-                        "type": "text",
-                        "text": f"未找到 {start_date} 到 {end_date} 之间的报告"
-                    }]
-                }
+def _resolve_dates(arguments: Dict[str, Any]) -> List[str]:
+    """从 dates 或 start_date/end_date 参数解析出日期列表"""
+    if "dates" in arguments:
+        return list(arguments["dates"])
 
-            result = {
-                "start_date": start_date,
-                "end_date": end_date,
-                "total_count": len(reports),
-                "reports": reports
-            }
+    start_date = arguments.get("start_date")
+    end_date = arguments.get("end_date")
+    if not start_date or not end_date:
+        raise InvalidToolArguments("需要提供 dates，或同时提供 start_date 和 end_date")
 
-            return {
-                "content": [{
-                    "type": "text",
-                    "text": json.dumps(result, ensure_ascii=False, indent=2)
-                }]
-            }
+    return _date_range(start_date, end_date, MAX_DATES_PER_QUERY)
 
-        elif name == "get_github_trending_report":
-            date = arguments.get("date")
-
-            if date:
-                # 获取指定日期的日报
-                report = await db.get_github_trending_report_by_date(date=date)
-                if not report:
-                    return {
-                        "content": [{
-                            "type": "text",
-                            "text": f"未找到 {date} 的 GitHub Trending 日报"
-                        }]
-                    }
-            else:
-                # 获取最新日报
-                report = await db.get_latest_github_trending_report()
-                if not report:
-                    return {
-                        "content": [{
-                            "type": "text",
-                            "text": "未找到任何 GitHub Trending 日报"
-                        }]
-                    }
-
-            return {
-                "content": [{
-                    "type": "text",
-                    "text": json.dumps(report, ensure_ascii=False, indent=2)
-                }]
-            }
 
-        elif name == "get_latest_stock_news":
-            stock_svc = get_stock_service()
+@register_tool("get_products_by_dates", cacheable=True, ttl=600, timeout=20, cost=3)
+async def _get_products_by_dates(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    dates = _resolve_dates(arguments)
+    limit = arguments["limit"]
 
-            # 获取最新交易日的股票资讯
-            result = await stock_svc.get_latest_trading_day_news()
+    products_by_date = await get_db_service().get_products_by_dates(dates=dates, limit=limit)
 
-            if result.get("news_count", 0) == 0:
-                return {
-                    "content": [{
-                        "type": "text",
-                        "text": "未找到最近的股票资讯数据"
-                    }]
-                }
+    total_count = sum(len(products) for products in products_by_date.values())
+    if total_count == 0:
+        return text_result(f"未找到 {min(dates)} 到 {max(dates)} 之间的产品数据")
 
-            return {
-                "content": [{
-                    "type": "text",
-                    "text": json.dumps(result, ensure_ascii=False, indent=2)
-                }]
-            }
+    return json_result({
+        "dates": list(products_by_date),
+        "total_count": total_count,
+        "products_by_date": {
+            date: filter_product_fields(products)
+            for date, products in products_by_date.items()
+        }
+    })
 
-        else:
-            return {
-                "content": [{
-                    "type": "text",
-                    "text": f"未知的工具: {name}"
-                }],
-                "isError": True
-            }
 
+@register_tool("get_product_stats", cacheable=True, ttl=300, timeout=30, cost=3)
+async def _get_product_stats(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    start_date = arguments.get("start_date")
+    end_date = arguments.get("end_date")
+
+    if start_date or end_date:
+        if not (start_date and end_date):
+            raise InvalidToolArguments("start_date 和 end_date 需要同时提供")
+        _date_range(start_date, end_date, MAX_STATS_DAYS)
+    else:
+        end = datetime.now()
+        start_date = (end - timedelta(days=arguments["days"] - 1)).strftime('%Y-%m-%d')
+        end_date = end.strftime('%Y-%m-%d')
+
+    result = await get_rollup_service().get_product_stats(
+        start_date=start_date,
+        end_date=end_date,
+        group_by=arguments.get("group_by"),
+        limit=arguments["limit"]
+    )
+
+    if result["summary"]["count"] == 0:
+        return text_result(f"未找到 {start_date} 到 {end_date} 之间的产品数据")
+
+    return json_result(result)
+
+
+@register_tool("search_products", cacheable=True, ttl=300, timeout=10, cost=5)
+async def _search_products(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    keyword = arguments["keyword"]
+    days = arguments["days"]
+    limit = arguments["limit"]
+
+    products = await get_db_service().search_products(
+        keyword=keyword,
+        days=days,
+        limit=limit
+    )
+
+    if not products:
+        return text_result(f"未找到包含关键词 '{keyword}' 的产品（最近 {days} 天）")
+
+    products = filter_product_fields(products)
+    return json_result({
+        "keyword": keyword,
+        "days": days,
+        "total_count": len(products),
+        "products": products
+    })
+
+
+@register_tool("get_top_products", cacheable=True, ttl=600, cost=2)
+async def _get_top_products(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    limit = arguments["limit"]
+    start_date = arguments.get("start_date")
+    end_date = arguments.get("end_date")
+
+    if start_date or end_date:
+        if not (start_date and end_date):
+            raise InvalidToolArguments("start_date 和 end_date 需要同时提供")
+        _date_range(start_date, end_date, MAX_STATS_DAYS)
+    elif "days" in arguments:
+        end = datetime.now()
+        start_date = (end - timedelta(days=arguments["days"] - 1)).strftime('%Y-%m-%d')
+        end_date = end.strftime('%Y-%m-%d')
+    else:
+        start_date = end_date = arguments.get("date", datetime.now().strftime('%Y-%m-%d'))
+
+    # 由按天维护的高票索引归并得到，不在数据库中排序
+    products = await get_rollup_service().get_top_products(
+        start_date=start_date,
+        end_date=end_date,
+        limit=limit
+    )
+
+    if start_date == end_date:
+        if not products:
+            return text_result(f"未找到 {start_date} 的产品数据")
+        window: Dict[str, Any] = {"date": start_date}
+    else:
+        if not products:
+            return text_result(f"未找到 {start_date} 到 {end_date} 之间的产品数据")
+        window = {"start_date": start_date, "end_date": end_date}
+
+    products = filter_product_fields(products)
+    return json_result({
+        **window,
+        "total_count": len(products),
+        "products": products
+    })
+
+
+def _report_columns(arguments: Dict[str, Any], content_field: str) -> str:
+    """根据 fields/sections 参数确定日报查询的列"""
+    fields = arguments.get("fields")
+    if not fields:
+        return "*"
+    columns = list(fields)
+    if arguments.get("sections") and content_field not in columns:
+        columns.append(content_field)
+    return ",".join(columns)
+
+
+# PostgreSQL undefined_column：fields 中的字段在日报表中不存在
+UNDEFINED_COLUMN = "42703"
+
+
+async def _fetch_report(query: Awaitable[Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    """
+    执行日报查询，fields 中包含不存在的字段时转换为参数错误
+
+    字段名只校验了格式，日报表的列由部署配置决定，因此由 PostgREST 判断字段是否存在。
+    """
+    try:
+        return await query
     except Exception as e:
-        logger.error(f"处理工具 {name} 时出错: {str(e)}", exc_info=True)
-        return {
-            "content": [{
-                "type": "text",
-                "text": f"错误: {str(e)}"
-            }],
-            "isError": True
-        }
+        if getattr(e, "code", None) == UNDEFINED_COLUMN:
+            raise InvalidToolArguments(f"fields 包含日报中不存在的字段: {getattr(e, 'message', e)}") from None
+        raise
+
+
+def _project_report(report: Dict[str, Any], arguments: Dict[str, Any], content_field: str) -> Dict[str, Any]:
+    """按 sections 参数把正文字段替换为匹配的章节"""
+    sections = arguments.get("sections")
+    if not sections:
+        return report
+
+    report = dict(report)
+    fields = arguments.get("fields")
+    if fields and content_field in fields:
+        content = report.get(content_field)
+    else:
+        content = report.pop(content_field, None)
+    report.update(select_sections(content, sections))
+    return report
+
+
+@register_tool("get_latest_report", cacheable=True, ttl=300)
+async def _get_latest_report(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    content_field = settings.REPORT_CONTENT_FIELD
+    report = await _fetch_report(get_db_service().get_latest_report(
+        columns=_report_columns(arguments, content_field)
+    ))
+
+    if not report:
+        return text_result("未找到任何报告")
+
+    return json_result(_project_report(report, arguments, content_field))
+
+
+@register_tool("get_report_by_date", cacheable=True, ttl=3600)
+async def _get_report_by_date(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    date = arguments["date"]
+    content_field = settings.REPORT_CONTENT_FIELD
+
+    report = await _fetch_report(get_db_service().get_report_by_date(
+        date=date,
+        columns=_report_columns(arguments, content_field)
+    ))
+
+    if not report:
+        return text_result(f"未找到 {date} 的报告")
+
+    return json_result(_project_report(report, arguments, content_field))
+
+
+@register_tool("get_reports_by_date_range", cacheable=True, ttl=3600, cost=2)
+async def _get_reports_by_date_range(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    start_date = arguments["start_date"]
+    end_date = arguments["end_date"]
+
+    reports = await get_db_service().get_reports_by_date_range(
+        start_date=start_date,
+        end_date=end_date
+    )
+
+    if not reports:
+        return text_result(f"未找到 {start_date} 到 {end_date} 之间的报告")
+
+    return json_result({
+        "start_date": start_date,
+        "end_date": end_date,
+        "total_count": len(reports),
+        "reports": reports
+    })
+
+
+@register_tool("get_github_trending_report", cacheable=True, ttl=600)
+async def _get_github_trending_report(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    date = arguments.get("date")
+    db = get_db_service()
+    content_field = settings.GITHUB_REPORT_CONTENT_FIELD
+    columns = _report_columns(arguments, content_field)
+
+    if date:
+        # 获取指定日期的日报
+        report = await _fetch_report(db.get_github_trending_report_by_date(date=date, columns=columns))
+        if not report:
+            return text_result(f"未找到 {date} 的 GitHub Trending 日报")
+    else:
+        # 获取最新日报
+        report = await _fetch_report(db.get_latest_github_trending_report(columns=columns))
+        if not report:
+            return text_result("未找到任何 GitHub Trending 日报")
+
+    return json_result(_project_report(report, arguments, content_field))
+
+
+# 增量轮询（since）每次都查询最新数据，只有整日快照使用缓存
+@register_tool("get_latest_stock_news", cacheable=True, ttl=30, timeout=10, cost=2, uncached_arguments=["since"])
+async def _get_latest_stock_news(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    stock_svc = get_stock_service()
+    include_content = arguments["include_content"]
+
+    if "since" in arguments:
+        try:
+            since = decode_cursor(arguments["since"])
+        except ValueError as e:
+            raise InvalidToolArguments(f"since: {e}") from None
+
+        # 增量模式：没有新资讯时也返回游标，便于客户端继续轮询
+        result = await stock_svc.get_stock_news_since(
+            since,
+            limit=arguments["limit"],
+            include_content=include_content
+        )
+        if "error" in result:
+            return text_result(f"错误: {result['error']}", is_error=True)
+        return json_result(result)
+
+    # 获取最新交易日的股票资讯
+    result = await stock_svc.get_latest_trading_day_news(include_content=include_content)
+
+    if result.get("news_count", 0) == 0:
+        return text_result("未找到最近的股票资讯数据")
+
+    return json_result(result)
+
+
+@register_tool("get_stock_news_page", cacheable=True, ttl=60, timeout=10, cost=2)
+async def _get_stock_news_page(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    cursor = None
+    if "cursor" in arguments:
+        try:
+            cursor = decode_cursor(arguments["cursor"])
+        except ValueError as e:
+            raise InvalidToolArguments(f"cursor: {e}") from None
+
+    result = await get_stock_service().get_stock_news_page(
+        days_back=arguments["days_back"],
+        page_size=arguments["page_size"],
+        cursor=cursor,
+        include_content=arguments["include_content"]
+    )
+
+    if "error" in result:
+        return text_result(f"错误: {result['error']}", is_error=True)
+
+    if result["news_count"] == 0 and cursor is None:
+        return text_result(f"未找到最近 {arguments['days_back']} 天的股票资讯")
+
+    return json_result(result)
+
+
+@register_tool("get_stock_news_content", cacheable=True, ttl=600)
+async def _get_stock_news_content(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    ids = arguments["ids"]
+
+    news = await get_stock_service().get_stock_news_content(ids)
+
+    if not news:
+        return text_result("未找到对应的股票资讯")
+
+    return json_result({
+        "news_count": len(news),
+        "news": news
+    })
+
+
+_unregistered_tools = set(_TOOL_SCHEMAS) - set(TOOL_REGISTRY)
+if _unregistered_tools:
+    raise RuntimeError(f"TOOLS 中的工具未注册处理函数: {', '.join(sorted(_unregistered_tools))}")
+
+
+async def execute_tool(name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    执行工具调用
+
+    Raises:
+        InvalidToolArguments: 参数不合法（由调用方转换为 JSON-RPC -32602 错误）
+    """
+    spec = TOOL_REGISTRY.get(name)
+    if spec is None:
+        return text_result(f"未知的工具: {name}", is_error=True)
+
+    arguments = spec.prepare_arguments(arguments)
+    # 等待其他实例的缓存结果也计入工具超时
+    deadline = time.monotonic() + spec.timeout
+
+    async def run() -> Dict[str, Any]:
+        # 工具内的后端查询可以读取截止时间，跳过调用方已经放弃的查询
+        token = set_deadline(deadline)
+        try:
+            return await asyncio.wait_for(spec.handler(arguments), timeout=max(0.0, deadline - time.monotonic()))
+        except InvalidToolArguments:
+            raise
+        except asyncio.TimeoutError:
+            logger.error("工具 %s 执行超时 (%ss)", name, spec.timeout)
+            return text_result(f"错误: 工具 {name} 执行超时", is_error=True)
+        except Exception as e:
+            logger.error("处理工具 %s 时出错: %s", name, e, exc_info=True)
+            return text_result(f"错误: {str(e)}", is_error=True)
+        finally:
+            reset_deadline(token)
+
+    if not spec.cacheable or any(key in arguments for key in spec.uncached_arguments):
+        return await run()
+
+    # 后端查询失败时服务层抛出异常，run 返回 isError 结果，不会被当作"未找到"缓存
+    return await result_cache.get_or_compute(
+        _cache_key(name, arguments),
+        spec.ttl,
+        run,
+        should_cache=lambda result: not result.get("isError"),
+        max_wait=spec.timeout
+    )
+
+
+# ============================================================
+# JSON-RPC 方法分发
+# ============================================================
+
+def _encode_json(data: Any) -> bytes:
+    """与 JSONResponse 相同的紧凑编码"""
+    return json.dumps(
+        data,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+def _precompute_result_prefix(result: Any) -> bytes:
+    """预先序列化静态 result，只在请求时拼接 id"""
+    return b'{"jsonrpc":"2.0","result":' + _encode_json(result) + b',"id":'
+
+
+INITIALIZE_RESULT = {
+    "protocolVersion": "2024-11-05",
+    "capabilities": {
+        "tools": {}
+    },
+    "serverInfo": {
+        "name": "ph-mcp-server",
+        "version": "1.0.0"
+    }
+}
+
+# 启动时预计算的静态响应
+_INITIALIZE_PREFIX = _precompute_result_prefix(INITIALIZE_RESULT)
+_TOOLS_LIST_PREFIX = _precompute_result_prefix({"tools": TOOLS})
+_EMPTY_RESULT_PREFIX = _precompute_result_prefix({})
+
+
+def _static_response(prefix: bytes, request_id: Any) -> Response:
+    return Response(
+        prefix + _encode_json(request_id) + b'}',
+        media_type="application/json"
+    )
+
+
+def _error_response(
+    code: int,
+    message: str,
+    request_id: Any,
+    status_code: int,
+    data: Any = None,
+    headers: Optional[Dict[str, str]] = None
+) -> JSONResponse:
+    error: Dict[str, Any] = {"code": code, "message": message}
+    if data is not None:
+        error["data"] = data
+    return JSONResponse({
+        "jsonrpc": "2.0",
+        "error": error,
+        "id": request_id
+    }, status_code=status_code, headers=headers)
+
+
+async def _handle_initialize(request: Request, params: Dict[str, Any], request_id: Any) -> Response:
+    return _static_response(_INITIALIZE_PREFIX, request_id)
+
+
+async def _handle_tools_list(request: Request, params: Dict[str, Any], request_id: Any) -> Response:
+    return _static_response(_TOOLS_LIST_PREFIX, request_id)
+
+
+async def _handle_empty(request: Request, params: Dict[str, Any], request_id: Any) -> Response:
+    # notifications/initialized 是通知，ping 是心跳，均返回空结果
+    return _static_response(_EMPTY_RESULT_PREFIX, request_id)
+
+
+# 客户端在响应前断开连接（沿用 nginx 的 499 约定，仅用于日志）
+CLIENT_CLOSED_REQUEST = 499
+
+
+async def _wait_for_disconnect(request: Request) -> None:
+    """请求体读取完毕后，下一条 ASGI 消息只会是 http.disconnect"""
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def _handle_tools_call(request: Request, params: Dict[str, Any], request_id: Any) -> Response:
+    tool_name = params.get("name")
+    arguments = params.get("arguments", {})
+
+    if not tool_name:
+        return _error_response(-32602, "Invalid params: missing tool name", request_id, 400)
+
+    # 工具执行与客户端断开竞争：客户端先断开时取消工具，连带取消后端查询
+    tool_task = asyncio.create_task(execute_tool(tool_name, arguments))
+    disconnect_task = asyncio.create_task(_wait_for_disconnect(request))
+    try:
+        await asyncio.wait({tool_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        tool_task.cancel()
+        raise
+    finally:
+        disconnect_task.cancel()
+
+    if not tool_task.done():
+        tool_task.cancel()
+        logger.info("客户端已断开，取消工具 %s (id=%s)", tool_name, request_id)
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+
+    try:
+        result = tool_task.result()
+    except InvalidToolArguments as e:
+        return _error_response(-32602, f"Invalid params: {e}", request_id, 400)
+
+    return JSONResponse({
+        "jsonrpc": "2.0",
+        "result": result,
+        "id": request_id
+    })
+
+
+MethodHandler = Callable[[Request, Dict[str, Any], Any], Awaitable[Response]]
+
+METHOD_HANDLERS: Dict[str, MethodHandler] = {
+    "initialize": _handle_initialize,
+    "tools/list": _handle_tools_list,
+    "tools/call": _handle_tools_call,
+    "notifications/initialized": _handle_empty,
+    "ping": _handle_empty,
+}
+
+
+# ============================================================
+# 限流
+# ============================================================
+
+rate_limiter = RateLimiter(
+    capacity=RATE_LIMIT_CAPACITY,
+    refill_rate=RATE_LIMIT_REFILL,
+    backend=RespBackend(RespClient(RATE_LIMIT_REDIS_URL)) if RATE_LIMIT_REDIS_URL else None
+)
+
+# JSON-RPC 限流错误码（服务端自定义错误区间）
+RATE_LIMIT_ERROR_CODE = -32029
+
+
+def _request_cost(method: Any, params: Dict[str, Any]) -> float:
+    """请求消耗的令牌数：tools/call 按工具成本计算，其他方法为 1"""
+    if method == "tools/call":
+        spec = TOOL_REGISTRY.get(params.get("name"))
+        if spec is not None:
+            return spec.cost
+    return 1
+
+
+def _rate_limited_response(e: RateLimitExceeded, request_id: Any) -> JSONResponse:
+    retry_after = math.ceil(e.retry_after)
+    return _error_response(
+        RATE_LIMIT_ERROR_CODE,
+        "Rate limit exceeded",
+        request_id,
+        429,
+        data={
+            "retry_after": retry_after,
+            "cost": e.cost,
+            "capacity": rate_limiter.capacity,
+            "refill_per_second": rate_limiter.refill_rate
+        },
+        headers={"Retry-After": str(retry_after)}
+    )
 
 
 # HTTP 路由处理函数
-async def health_check(request):
-    """健康检查端点"""
+async def liveness_check(request):
+    """存活探针：只说明进程可以处理请求，不访问任何后端"""
     return JSONResponse({
-        "status": "healthy",
+        "status": "alive",
+        "service": "Product Hunt MCP Server",
+        "version": "1.0.0",
+        "uptime_seconds": round(time.monotonic() - STARTED_AT, 1)
+    })
+
+
+async def readiness_check(request):
+    """
+    就绪探针：读取后台探测的缓存结果，不产生额外的后端请求
+
+    预热未完成或 READY_BACKENDS 中任一后端不健康时返回 503。
+    """
+    backends = prober.snapshot()
+    if not warmup_state["ready"]:
+        status = "warming_up"
+    elif prober.is_healthy(READY_BACKENDS):
+        status = "ready"
+    else:
+        status = "degraded"
+
+    return JSONResponse({
+        "status": status,
         "service": "Product Hunt MCP Server",
         "version": "1.0.0",
         "mode": "http",
-        "port": PORT
+        "port": PORT,
+        "warmup": warmup_state,
+        "backends": backends,
+        "required_backends": list(READY_BACKENDS),
+        "postgres_pool": stock_service.pool_stats() if stock_service is not None else None,
+        "data_sources": {
+            **(db_service.source_stats() if db_service is not None else {"ph": None, "github": None}),
+            "postgres": stock_service.source_stats() if stock_service is not None else None
+        },
+        "caches": {
+            "tool_results": result_cache.stats(),
+            "products": db_service.cache_stats() if db_service is not None else None,
+            "rollups": rollup_service.cache_stats() if rollup_service is not None else None
+        },
+        "recorder": recorder.stats() if recorder is not None else None,
+        "logging": log_stats(),
+        "event_loop": {
+            "lag": loop_monitor.stats(),
+            "blocking": blocking_detector.stats() if blocking_detector is not None else None
+        }
+    }, status_code=200 if status == "ready" else 503)
+
+
+profiler = SamplingProfiler()
+
+
+def _admin_authorized(request: Request) -> bool:
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    return hmac.compare_digest(token.strip().encode(), ADMIN_TOKEN.encode())
+
+
+async def admin_profile(request: Request) -> Response:
+    """
+    对当前进程采样分析，返回 collapsed stack 文本（可直接用 flamegraph.pl 或 speedscope 打开）
+
+    查询参数: seconds（默认 10，最多 60）、hz（默认 100，最多 250）
+    """
+    if not ADMIN_TOKEN:
+        return JSONResponse({"error": "Not Found"}, status_code=404)
+    if not _admin_authorized(request):
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+
+    try:
+        seconds = float(request.query_params.get("seconds", "10"))
+        hz = int(request.query_params.get("hz", "100"))
+    except ValueError:
+        return JSONResponse({"error": "seconds 和 hz 必须是数字"}, status_code=400)
+    if not math.isfinite(seconds):
+        return JSONResponse({"error": "seconds 必须是有限的数字"}, status_code=400)
+
+    logger.info("开始 CPU 采样分析: %ss, %sHz", seconds, hz)
+    try:
+        # 采样在线程中进行，事件循环照常处理请求（也会出现在采样结果中）
+        collapsed, stats = await asyncio.to_thread(profiler.profile, seconds, hz)
+    except ProfilerBusy as e:
+        return JSONResponse({"error": str(e)}, status_code=409)
+    logger.info("CPU 采样分析完成: %s", stats)
+
+    return Response(collapsed, media_type="text/plain; charset=utf-8", headers={
+        "Content-Disposition": f'attachment; filename="profile-{int(time.time())}.collapsed"',
+        "X-Profile-Samples": str(stats["samples"]),
+        "X-Profile-Seconds": str(stats["seconds"]),
     })
 
 
@@ -522,6 +1349,8 @@ async def root(request):
         "port": PORT,
         "endpoints": {
             "health": f"http://{HOST}:{PORT}/health",
+            "liveness": f"http://{HOST}:{PORT}/health/live",
+            "readiness": f"http://{HOST}:{PORT}/health/ready",
             "mcp": f"http://{HOST}:{PORT}/mcp"
         },
         "tools": [tool["name"] for tool in TOOLS],
@@ -534,114 +1363,159 @@ async def root(request):
     })
 
 
+recorder: Optional[RequestRecorder] = (
+    RequestRecorder(
+        RECORD_PATH,
+        sample_rate=RECORD_SAMPLE_RATE,
+        max_bytes=RECORD_MAX_BYTES,
+        backup_count=RECORD_BACKUPS
+    ) if RECORD_PATH else None
+)
+
+
 async def mcp_handler(request: Request):
     """MCP JSON-RPC 端点"""
+    # 同一请求中的日志（包括工具任务中的）都带上 request_id
+    token = bind_request(request.headers.get("x-request-id"))
+    log_request_id = current_request_id()
+    try:
+        response = await _handle_mcp(request)
+    finally:
+        unbind_request(token)
+    response.headers["X-Request-ID"] = log_request_id
+    return response
+
+
+async def _handle_mcp(request: Request) -> Response:
     try:
         body = await request.json()
     except Exception as e:
-        return JSONResponse({
-            "jsonrpc": "2.0",
-            "error": {
-                "code": -32700,
-                "message": "Parse error",
-                "data": str(e)
-            },
-            "id": None
-        }, status_code=400)
+        return _error_response(-32700, "Parse error", None, 400, data=str(e))
+
+    if recorder is None or not recorder.sampled():
+        return await _dispatch(request, body)
+
+    started = time.perf_counter()
+    response = await _dispatch(request, body)
+    recorder.record(
+        body,
+        response.status_code,
+        (time.perf_counter() - started) * 1000,
+        len(response.body)
+    )
+    return response
+
 
+async def _dispatch(request: Request, body: Dict[str, Any]) -> Response:
     method = body.get("method")
     params = body.get("params", {})
     request_id = body.get("id")
 
-    logger.info(f"收到请求: method={method}, id={request_id}")
+    logger.info("收到请求: method=%s, id=%s", method, request_id)
+
+    if RATE_LIMIT_ENABLED:
+        client = client_identity(
+            request.headers,
+            request.client.host if request.client else None,
+            trust_forwarded=RATE_LIMIT_TRUST_FORWARDED,
+            api_keys=RATE_LIMIT_API_KEYS,
+            trusted_hops=RATE_LIMIT_TRUSTED_HOPS
+        )
+        try:
+            await rate_limiter.check(client, _request_cost(method, params))
+        except RateLimitExceeded as e:
+            logger.warning("客户端 %s 超出限流配额: method=%s, retry_after=%.1fs", client, method, e.retry_after)
+            return _rate_limited_response(e, request_id)
+
+    handler = METHOD_HANDLERS.get(method)
+    if handler is None:
+        logger.warning("未知方法: %s", method)
+        return _error_response(-32601, f"Method not found: {method}", request_id, 404)
+
+    return await handler(request, params, request_id)
+
+
+# ============================================================
+# 启动预热
+# ============================================================
+
+# 预热状态：首轮探测完成后 ready 置为 True
+warmup_state: Dict[str, Any] = {"ready": False, "duration_ms": None}
+
+# 事件循环延迟监控；阻塞检测只在调试时开启
+loop_monitor = LoopLagMonitor(interval=LOOP_MONITOR_INTERVAL)
+blocking_detector: Optional[BlockingDetector] = (
+    BlockingDetector(threshold=BLOCKING_THRESHOLD_MS / 1000) if BLOCKING_DETECTOR_ENABLED else None
+)
 
-    # 处理 initialize
-    if method == "initialize":
-        return JSONResponse({
-            "jsonrpc": "2.0",
-            "result": {
-                "protocolVersion": "2024-11-05",
-                "capabilities": {
-                    "tools": {}
-                },
-                "serverInfo": {
-                    "name": "ph-mcp-server",
-                    "version": "1.0.0"
-                }
-            },
-            "id": request_id
-        })
-
-    # 处理 tools/list
-    elif method == "tools/list":
-        return JSONResponse({
-            "jsonrpc": "2.0",
-            "result": {
-                "tools": TOOLS
-            },
-            "id": request_id
-        })
-
-    # 处理 tools/call
-    elif method == "tools/call":
-        tool_name = params.get("name")
-        arguments = params.get("arguments", {})
-
-        if not tool_name:
-            return JSONResponse({
-                "jsonrpc": "2.0",
-                "error": {
-                    "code": -32602,
-                    "message": "Invalid params: missing tool name"
-                },
-                "id": request_id
-            }, status_code=400)
-
-        result = await execute_tool(tool_name, arguments)
-
-        return JSONResponse({
-            "jsonrpc": "2.0",
-            "result": result,
-            "id": request_id
-        })
-
-    # 处理 notifications/initialized
-    elif method == "notifications/initialized":
-        # 这是一个通知，不需要响应
-        return JSONResponse({
-            "jsonrpc": "2.0",
-            "result": {},
-            "id": request_id
-        })
-
-    # 处理 ping
-    elif method == "ping":
-        return JSONResponse({
-            "jsonrpc": "2.0",
-            "result": {},
-            "id": request_id
-        })
-
-    # 未知方法
-    else:
-        logger.warning(f"未知方法: {method}")
-        return JSONResponse({
-            "jsonrpc": "2.0",
-            "error": {
-                "code": -32601,
-                "message": f"Method not found: {method}"
-            },
-            "id": request_id
-        }, status_code=404)
+# 后台后端探测，就绪探针只读取缓存的探测结果
+prober = BackendProber(interval=PROBE_INTERVAL, timeout=PROBE_TIMEOUT)
+prober.add_check("supabase", lambda: get_db_service().ping())
+prober.add_check("supabase_github", lambda: get_db_service().ping_github())
+prober.add_check("postgres", lambda: get_stock_service().ping())
+
+
+async def warmup_backends() -> None:
+    """
+    首轮探测即预热：并行创建 Supabase 客户端和 PostgreSQL 连接池，
+    并对每个后端完成一次往返
+    """
+    started = time.perf_counter()
+    await prober.probe_once()
+    warmup_state["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    warmup_state["ready"] = True
+    logger.info("后端预热结束，耗时 %sms", warmup_state['duration_ms'])
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """应用生命周期：启动时后台预热并开始周期探测，关闭时释放连接池"""
+
+    async def startup() -> None:
+        if WARMUP_ENABLED:
+            await warmup_backends()
+        else:
+            warmup_state["ready"] = True
+        prober.start()
+
+    if recorder is not None:
+        recorder.start()
+        logger.info("请求录制已启用: %s (采样率 %s)", RECORD_PATH, RECORD_SAMPLE_RATE)
+
+    loop_monitor.start()
+    if blocking_detector is not None:
+        blocking_detector.start()
+        logger.info("事件循环阻塞检测已启用，阈值 %.0fms", BLOCKING_THRESHOLD_MS)
+
+    startup_task = asyncio.create_task(startup())
+    try:
+        yield
+    finally:
+        if not startup_task.done():
+            startup_task.cancel()
+        await prober.stop()
+        await loop_monitor.stop()
+        if blocking_detector is not None:
+            blocking_detector.stop()
+        await result_cache.close()
+        await rate_limiter.close()
+        if recorder is not None:
+            recorder.stop()
+        if stock_service is not None:
+            stock_service.close()
 
 
 # 创建 Starlette 应用
 app = Starlette(
     debug=True,
+    lifespan=lifespan,
     routes=[
         Route("/", root),
-        Route("/health", health_check),
+        Route("/health", readiness_check),
+        Route("/health/live", liveness_check),
+        Route("/health/ready", readiness_check),
         Route("/mcp", mcp_handler, methods=["POST"]),
+        Route("/admin/profile", admin_profile, methods=["POST"]),
     ]
 )
 
@@ -651,23 +1525,28 @@ def main():
     logger.info("=" * 60)
     logger.info("Product Hunt MCP Server (HTTP Mode)")
     logger.info("=" * 60)
-    logger.info(f"服务器地址: http://{HOST}:{PORT}")
-    logger.info(f"健康检查: http://{HOST}:{PORT}/health")
-    logger.info(f"MCP 端点: http://{HOST}:{PORT}/mcp (POST)")
+    logger.info("服务器地址: http://%s:%s", HOST, PORT)
+    logger.info("健康检查: http://%s:%s/health/ready (存活: /health/live)", HOST, PORT)
+    logger.info("MCP 端点: http://%s:%s/mcp (POST)", HOST, PORT)
     logger.info("=" * 60)
     logger.info("客户端配置:")
-    logger.info(f"  URL: http://{HOST}:{PORT}/mcp")
-    logger.info(f"  Method: POST")
-    logger.info(f"  Content-Type: application/json")
+    logger.info("  URL: http://%s:%s/mcp", HOST, PORT)
+    logger.info("  Method: POST")
+    logger.info("  Content-Type: application/json")
     logger.info("=" * 60)
     logger.info("按 Ctrl+C 停止服务器")
     logger.info("=" * 60)
 
+    import uvicorn
+
     # 启动 HTTP 服务器
+    # log_config=None：不使用 uvicorn 自带的同步 StreamHandler，uvicorn 和访问日志
+    # 传播到根 logger，与其他日志一样经过队列输出并使用 MCP_LOG_FORMAT 格式
     uvicorn.run(
         app,
         host=HOST,
         port=PORT,
+        log_config=None,
         log_level="info",
         access_log=True
     )
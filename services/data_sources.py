@@ -0,0 +1,211 @@
+"""
+多数据源路由
+
+同一类数据（如 Product Hunt 项目的多个区域镜像、PostgreSQL 的多个只读副本）
+配置为一组数据源，每个数据源有自己的客户端（连接池），首次使用时创建。
+
+- 路由：按后台探测测得的延迟（指数加权平均）从快到慢选择健康的数据源；
+  尚未探测过的按配置顺序排在后面。只用探测延迟排序，避免承接了全部
+  流量（含慢查询）的数据源因为请求延迟偏高而被频繁换下
+- 故障切换：连接类错误（由调用方的 retryable 判断）时自动改用下一个数据源；
+  连续失败达到阈值的数据源在冷却时间内不参与路由（全部不可用时仍会尝试）
+- 查询本身的错误（如参数错误）直接抛出，不切换也不计入失败
+- 探测：各数据源在各自的线程中并行探测，每个数据源单独超时，
+  一个镜像无响应不会拖慢其他镜像的探测；任一数据源健康即视为后端可用
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 探测延迟的指数加权平均系数
+LATENCY_EWMA_ALPHA = 0.3
+
+
+class DataSource:
+    """单个数据源及其健康状态"""
+
+    __slots__ = ("name", "config", "client", "lock", "probing", "latency_ms", "failures", "down_until", "last_error")
+
+    def __init__(self, config: Dict[str, Any]):
+        self.name: str = config["name"]
+        self.config = config
+        self.client: Any = None
+        # 创建客户端可能需要建立连接，每个数据源单独加锁，避免无响应的数据源阻塞其他数据源
+        self.lock = threading.Lock()
+        # 仍在线程中执行的探测（超时后不会被中断），避免在同一数据源上堆积线程
+        self.probing: Optional[concurrent.futures.Future] = None
+        self.latency_ms: Optional[float] = None
+        self.failures = 0
+        self.down_until = 0.0
+        self.last_error: Optional[str] = None
+
+    def to_dict(self, now: float) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "status": "down" if self.down_until > now else "ok",
+            "latency_ms": round(self.latency_ms, 1) if self.latency_ms is not None else None,
+            "consecutive_failures": self.failures,
+            "connected": self.client is not None,
+            "error": self.last_error,
+        }
+
+
+class SourceRouter:
+    """
+    一类数据源的路由和故障切换
+
+    Args:
+        kind: 数据源类型（用于日志）
+        configs: 数据源配置列表（config.settings.data_sources）
+        connect: 根据配置创建客户端（连接池），在线程中调用
+        retryable: 判断异常是否为连接类错误（可以切换到其他数据源重试）
+        failure_threshold: 连续失败多少次后暂停路由
+        cooldown: 暂停路由的时长（秒）
+        probe_timeout: 单个数据源的探测超时（秒），应小于后端探测的整体超时
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        configs: List[Dict[str, Any]],
+        connect: Callable[[Dict[str, Any]], Any],
+        retryable: Callable[[BaseException], bool],
+        failure_threshold: int = 2,
+        cooldown: float = 30.0,
+        probe_timeout: float = 3.0
+    ):
+        self.kind = kind
+        self.sources = [DataSource(config) for config in configs]
+        self._connect = connect
+        self._retryable = retryable
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.probe_timeout = probe_timeout
+        self._probe_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=len(self.sources), thread_name_prefix=f"probe-{kind}"
+        )
+
+    def client(self, source: DataSource) -> Any:
+        """数据源的客户端（首次调用时创建）"""
+        if source.client is None:
+            with source.lock:
+                if source.client is None:
+                    source.client = self._connect(source.config)
+                    logger.info("数据源 %s/%s 的客户端已创建", self.kind, source.name)
+        return source.client
+
+    def ordered(self) -> List[DataSource]:
+        """路由顺序：健康的按探测延迟从低到高，暂停中的排在最后"""
+        now = time.monotonic()
+        indexed = list(enumerate(self.sources))
+        healthy = [(i, s) for i, s in indexed if s.down_until <= now]
+        down = [(i, s) for i, s in indexed if s.down_until > now]
+        healthy.sort(key=lambda item: (item[1].latency_ms is None, item[1].latency_ms or 0.0, item[0]))
+        down.sort(key=lambda item: item[1].down_until)
+        return [s for _, s in healthy + down]
+
+    def _succeeded(self, source: DataSource, latency_ms: Optional[float] = None) -> None:
+        if source.failures >= self.failure_threshold:
+            logger.info("数据源 %s/%s 已恢复", self.kind, source.name)
+        source.failures = 0
+        source.down_until = 0.0
+        source.last_error = None
+        if latency_ms is not None:
+            source.latency_ms = latency_ms if source.latency_ms is None else (
+                LATENCY_EWMA_ALPHA * latency_ms + (1 - LATENCY_EWMA_ALPHA) * source.latency_ms
+            )
+
+    def _failed(self, source: DataSource, error: BaseException) -> None:
+        source.failures += 1
+        source.last_error = str(error) or type(error).__name__
+        if source.failures >= self.failure_threshold:
+            if source.failures == self.failure_threshold:
+                logger.warning(
+                    "数据源 %s/%s 连续失败 %s 次，%ss 内暂停路由: %s",
+                    self.kind, source.name, source.failures, self.cooldown, source.last_error
+                )
+            source.down_until = time.monotonic() + self.cooldown
+
+    async def run(self, attempt: Callable[[DataSource], Awaitable[T]]) -> T:
+        """
+        按路由顺序执行 attempt(source)，连接类错误时切换到下一个数据源
+
+        Raises:
+            所有数据源都失败时抛出最后一个错误；非连接类错误直接抛出
+        """
+        last_error: Optional[BaseException] = None
+        for source in self.ordered():
+            try:
+                result = await attempt(source)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not self._retryable(e):
+                    raise
+                self._failed(source, e)
+                last_error = e
+                if len(self.sources) > 1:
+                    logger.warning("数据源 %s/%s 请求失败，尝试下一个数据源: %s", self.kind, source.name, e)
+                continue
+            self._succeeded(source)
+            return result
+        raise last_error
+
+    def probe(self, check: Callable[[DataSource], None]) -> None:
+        """
+        并行探测所有数据源并更新延迟（同步调用，在线程中执行）
+
+        每个数据源最多等待 probe_timeout 秒，超时或上一次探测仍未返回都计为失败。
+
+        Raises:
+            所有数据源都不可用时抛出最后一个错误
+        """
+        def timed(source: DataSource) -> float:
+            started = time.perf_counter()
+            check(source)
+            return (time.perf_counter() - started) * 1000
+
+        last_error: Optional[BaseException] = None
+        pending: List[DataSource] = []
+        for source in self.sources:
+            if source.probing is not None and not source.probing.done():
+                last_error = TimeoutError("上一次探测仍未返回")
+                self._failed(source, last_error)
+                continue
+            source.probing = self._probe_pool.submit(timed, source)
+            pending.append(source)
+
+        concurrent.futures.wait([source.probing for source in pending], timeout=self.probe_timeout)
+
+        healthy = 0
+        for source in pending:
+            if not source.probing.done():
+                last_error = TimeoutError(f"探测超时 ({self.probe_timeout}s)")
+                self._failed(source, last_error)
+                continue
+            error = source.probing.exception()
+            if error is not None:
+                last_error = error
+                self._failed(source, error)
+                continue
+            self._succeeded(source, source.probing.result())
+            healthy += 1
+        if healthy == 0 and last_error is not None:
+            raise last_error
+
+    def clients(self) -> List[Any]:
+        """已创建的客户端"""
+        return [source.client for source in self.sources if source.client is not None]
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """各数据源的状态，按当前路由顺序"""
+        now = time.monotonic()
+        return [source.to_dict(now) for source in self.ordered()]
@@ -0,0 +1,58 @@
+"""
+日报 Markdown 章节拆分
+
+按标题把日报正文拆成章节，每个章节包含标题下的全部内容（含下级标题），
+调用方可以只返回需要的章节。同一份正文的拆分结果会被缓存，同一篇日报
+的不同章节请求只解析一次。
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Sequence, Tuple
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$", re.MULTILINE)
+
+
+@lru_cache(maxsize=64)
+def split_sections(markdown: str) -> Tuple[Tuple[str, str], ...]:
+    """
+    拆分 Markdown 为 (标题, 内容) 元组，按出现顺序
+
+    章节从标题行开始，到下一个同级或更高级标题为止。
+    """
+    headings = [
+        (match.start(), len(match.group(1)), match.group(2))
+        for match in _HEADING.finditer(markdown)
+    ]
+    sections = []
+    for i, (start, level, title) in enumerate(headings):
+        end = len(markdown)
+        for next_start, next_level, _ in headings[i + 1:]:
+            if next_level <= level:
+                end = next_start
+                break
+        sections.append((title, markdown[start:end].strip()))
+    return tuple(sections)
+
+
+def select_sections(markdown: str, names: Sequence[str]) -> Dict[str, Any]:
+    """
+    选出标题包含任一 names（不区分大小写）的章节
+
+    Returns:
+        {"sections": [{"title", "content"}], "available_sections": [全部标题]}
+    """
+    sections = split_sections(markdown) if isinstance(markdown, str) else ()
+    wanted = [name.lower() for name in names]
+    matched: List[Dict[str, str]] = []
+    for title, content in sections:
+        if not any(name in title.lower() for name in wanted):
+            continue
+        # 下级章节已包含在匹配的上级章节中
+        if matched and content in matched[-1]["content"]:
+            continue
+        matched.append({"title": title, "content": content})
+    return {
+        "sections": matched,
+        "available_sections": [title for title, _ in sections],
+    }
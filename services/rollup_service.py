@@ -0,0 +1,307 @@
+from typing import List, Dict, Any, Iterable, Optional
+from collections import defaultdict
+from datetime import date as date_cls, datetime, timedelta
+import asyncio
+import bisect
+import heapq
+import itertools
+import logging
+import time
+
+from config import settings
+from services.supabase_service import SupabaseService, contiguous_date_runs
+
+logger = logging.getLogger(__name__)
+
+# 当天数据仍在变化，汇总结果的刷新间隔（秒）
+CURRENT_DAY_REFRESH_SECONDS = 600
+# 汇总结果中返回的分位数
+PERCENTILES = (50, 90, 99)
+# 内存中最多保留的日汇总数量
+MAX_ROLLUP_DAYS = 400
+GROUP_BY_OPTIONS = ("day", "topic", "maker")
+# 每天保留的高票产品数量，需不小于 get_top_products 的 limit 上限
+TOP_K_PER_DAY = 50
+
+
+def _rollup_columns() -> str:
+    """汇总只需要的列；高票产品的完整数据在返回前按 id 单独获取"""
+    return ",".join(["id", "fetch_date", "votes_count", settings.PRODUCT_TOPICS_FIELD, settings.PRODUCT_MAKERS_FIELD])
+
+
+def _labels(value: Any) -> List[str]:
+    """把 topics/makers 字段统一转成名称列表（兼容字符串、字符串列表、对象列表）"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(",") if item.strip()]
+    if isinstance(value, dict):
+        value = [value]
+    labels = []
+    for item in value:
+        if isinstance(item, dict):
+            item = item.get("name") or item.get("username")
+        if item:
+            labels.append(str(item))
+    return labels
+
+
+def _percentile(sorted_votes: List[int], percentile: int) -> int:
+    """最近秩法分位数"""
+    if not sorted_votes:
+        return 0
+    index = max(0, -(-len(sorted_votes) * percentile // 100) - 1)
+    return sorted_votes[index]
+
+
+def _votes(row: Dict[str, Any]) -> int:
+    return row.get("votes_count") or 0
+
+
+def _summarize(votes: List[int]) -> Dict[str, Any]:
+    total = sum(votes)
+    summary = {
+        "count": len(votes),
+        "votes_sum": total,
+        "votes_avg": round(total / len(votes), 2) if votes else 0,
+        "votes_max": votes[-1] if votes else 0,
+    }
+    for p in PERCENTILES:
+        summary[f"votes_p{p}"] = _percentile(votes, p)
+    return summary
+
+
+class DayRollup:
+    """
+    单日产品汇总：投票数（有序）、按 topic/maker 分组的投票数，
+    以及按投票数降序的前 TOP_K_PER_DAY 个产品（高票索引）
+
+    final 表示汇总时该日期已经过去（数据不再变化）；当天的汇总在日期
+    过去后需要再完整重建一次，补上最后一次刷新之后抓取的产品。
+    """
+
+    __slots__ = ("date", "final", "votes", "groups", "top", "ids", "last_fetch_date", "refreshed_at")
+
+    def __init__(self, date: str, rows: Iterable[Dict[str, Any]], final: bool):
+        self.date = date
+        self.final = final
+        self.votes: List[int] = []
+        self.groups: Dict[str, Dict[str, List[int]]] = {
+            "topic": defaultdict(list),
+            "maker": defaultdict(list),
+        }
+        self.top: List[Dict[str, Any]] = []
+        self.ids: set = set()
+        self.last_fetch_date = ""
+        self.add_rows(list(rows))
+
+    def add_rows(self, rows: List[Dict[str, Any]]) -> None:
+        """合并新抓取的产品行（增量更新，调用方保证行未被汇总过）"""
+        for row in rows:
+            votes = _votes(row)
+            bisect.insort(self.votes, votes)
+            for topic in _labels(row.get(settings.PRODUCT_TOPICS_FIELD)):
+                self.groups["topic"][topic].append(votes)
+            for maker in _labels(row.get(settings.PRODUCT_MAKERS_FIELD)):
+                self.groups["maker"][maker].append(votes)
+            if row.get("id") is not None:
+                self.ids.add(row["id"])
+            self.last_fetch_date = max(self.last_fetch_date, row.get("fetch_date") or "")
+        if rows:
+            self.top = heapq.nlargest(TOP_K_PER_DAY, self.top + rows, key=_votes)
+        self.refreshed_at = time.monotonic()
+
+    def contains_any(self, rows: List[Dict[str, Any]]) -> bool:
+        return any(row.get("id") in self.ids for row in rows if row.get("id") is not None)
+
+
+class RollupService:
+    """
+    产品数据的预计算汇总
+
+    按天维护 ph_products 的汇总（数量、投票数分布、按 topic/maker 分组），
+    历史日期只汇总一次，当天数据按 CURRENT_DAY_REFRESH_SECONDS 增量刷新，
+    日期过去后再完整重建一次。
+    查询时只合并日汇总，只有汇总结果返回给调用方，不再传输原始产品行。
+
+    每天同时保留投票数最高的 TOP_K_PER_DAY 个产品，任意日期窗口的高票产品
+    由各天的有序列表归并得到，不需要在数据库中对整个窗口排序。汇总只查询
+    需要的列，最终返回的高票产品再按 id 取回完整数据。
+    """
+
+    def __init__(self, db: SupabaseService):
+        self.db = db
+        self._days: Dict[str, DayRollup] = {}
+        logger.info("Rollup Service 已初始化")
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """已汇总的天数"""
+        return {"days": len(self._days), "capacity": MAX_ROLLUP_DAYS}
+
+    def _is_stale(self, date: str, today: str) -> bool:
+        rollup = self._days.get(date)
+        if rollup is None:
+            return True
+        if date < today:
+            # 汇总时仍是当天的日期，过去后首次读取时完整重建一次
+            return not rollup.final
+        return time.monotonic() - rollup.refreshed_at > CURRENT_DAY_REFRESH_SECONDS
+
+    async def _ensure_days(self, dates: List[str]) -> None:
+        """补齐缺失或过期的日汇总，缺失日期按连续日期段合并为范围查询"""
+        today = date_cls.today().isoformat()
+        stale = [d for d in dates if self._is_stale(d, today)]
+        if not stale:
+            return
+
+        # 已有汇总的当天只拉取上次之后新抓取的行
+        current = self._days.get(today)
+        if today in stale and current is not None and current.last_fetch_date:
+            stale.remove(today)
+            await self._refresh_current_day(current)
+            if not stale:
+                return
+
+        # 不相邻的日期（如部分日期已被淘汰）按连续日期段分别查询，不重新读取中间仍然有效的日期
+        runs = contiguous_date_runs(stale)
+        pages = await asyncio.gather(*(
+            self.db.fetch_products_in_range(start, end, columns=_rollup_columns())
+            for start, end in runs
+        ))
+        rows = [row for page in pages for row in page]
+
+        by_day: Dict[str, List[Dict[str, Any]]] = {d: [] for d in stale}
+        for row in rows:
+            day = (row.get("fetch_date") or "")[:10]
+            if day in by_day:
+                by_day[day].append(row)
+
+        for day, day_rows in by_day.items():
+            self._days[day] = DayRollup(day, day_rows, final=day < today)
+
+        if len(self._days) > MAX_ROLLUP_DAYS:
+            requested = set(dates)
+            evictable = sorted(
+                (d for d in self._days if d not in requested),
+                key=lambda d: self._days[d].refreshed_at
+            )
+            for day in evictable[:len(self._days) - MAX_ROLLUP_DAYS]:
+                del self._days[day]
+
+        logger.info(
+            "汇总了 %s 个产品 (%s 到 %s，%s 个日期段，更新 %s 天)",
+            len(rows), runs[0][0], runs[-1][1], len(runs), len(stale)
+        )
+
+    async def _refresh_current_day(self, rollup: DayRollup) -> None:
+        """增量刷新当天汇总；新行中出现已汇总的产品（重新抓取）时整天重建"""
+        rows = await self.db.fetch_products_in_range(
+            rollup.date, rollup.date, columns=_rollup_columns(), since=rollup.last_fetch_date
+        )
+        if rollup.contains_any(rows):
+            rows = await self.db.fetch_products_in_range(rollup.date, rollup.date, columns=_rollup_columns())
+            self._days[rollup.date] = DayRollup(rollup.date, rows, final=False)
+            logger.info("重建了 %s 的汇总 (%s 个产品)", rollup.date, len(rows))
+            return
+
+        rollup.add_rows(rows)
+        if rows:
+            logger.info("增量汇总了 %s 个新产品 (%s)", len(rows), rollup.date)
+
+    async def get_product_stats(
+        self,
+        start_date: str,
+        end_date: str,
+        group_by: Optional[str] = None,
+        limit: int = 20
+    ) -> Dict[str, Any]:
+        """
+        获取日期范围内的产品统计
+
+        Args:
+            start_date: 开始日期，格式为 YYYY-MM-DD
+            end_date: 结束日期，格式为 YYYY-MM-DD
+            group_by: 分组维度（day/topic/maker），None 表示只返回总体统计
+            limit: topic/maker 分组时按产品数量返回前 N 组
+
+        Returns:
+            总体统计（数量、投票总数/均值/分位数）以及分组统计
+        """
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        end = datetime.strptime(end_date, '%Y-%m-%d')
+        dates = [
+            (start + timedelta(days=i)).strftime('%Y-%m-%d')
+            for i in range((end - start).days + 1)
+        ]
+
+        await self._ensure_days(dates)
+        rollups = [self._days[d] for d in dates]
+
+        all_votes = sorted(v for rollup in rollups for v in rollup.votes)
+        result: Dict[str, Any] = {
+            "start_date": start_date,
+            "end_date": end_date,
+            "summary": _summarize(all_votes),
+        }
+
+        if group_by == "day":
+            result["groups"] = [
+                {"key": rollup.date, **_summarize(rollup.votes)}
+                for rollup in reversed(rollups)
+            ]
+        elif group_by in ("topic", "maker"):
+            merged: Dict[str, List[int]] = defaultdict(list)
+            for rollup in rollups:
+                for key, votes in rollup.groups[group_by].items():
+                    merged[key].extend(votes)
+            ranked = sorted(merged.items(), key=lambda item: (-len(item[1]), -sum(item[1]), item[0]))
+            result["group_count"] = len(merged)
+            result["groups"] = [
+                {"key": key, **_summarize(sorted(votes))}
+                for key, votes in ranked[:limit]
+            ]
+
+        return result
+
+    async def get_top_products(
+        self,
+        start_date: str,
+        end_date: str,
+        limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """
+        获取日期范围内投票数最多的产品
+
+        Args:
+            start_date: 开始日期，格式为 YYYY-MM-DD
+            end_date: 结束日期，格式为 YYYY-MM-DD
+            limit: 返回的产品数量，不超过 TOP_K_PER_DAY
+
+        Returns:
+            按投票数降序的产品列表（原始产品行）
+        """
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        end = datetime.strptime(end_date, '%Y-%m-%d')
+        dates = [
+            (start + timedelta(days=i)).strftime('%Y-%m-%d')
+            for i in range((end - start).days + 1)
+        ]
+
+        await self._ensure_days(dates)
+
+        # 各天的 top 已按投票数降序，归并后取前 limit 个；票数相同时较新的日期在前
+        merged = heapq.merge(
+            *(self._days[d].top for d in reversed(dates)),
+            key=_votes,
+            reverse=True
+        )
+        top = list(itertools.islice(merged, min(limit, TOP_K_PER_DAY)))
+
+        # 汇总中只有部分列，按 id 取回这些产品的完整数据（同一产品可能在多天出现）
+        rows = await self.db.get_products_by_ids(list({row.get("id") for row in top} - {None}))
+        full = {(row.get("id"), (row.get("fetch_date") or "")[:10]): row for row in rows}
+        return [
+            full[key]
+            for key in ((row.get("id"), (row.get("fetch_date") or "")[:10]) for row in top)
+            if key in full
+        ]
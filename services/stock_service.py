@@ -1,34 +1,259 @@
-import psycopg2
-from typing import List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Optional, Sequence, Tuple, TypeVar
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+import asyncio
+import base64
+import json
 import logging
+import threading
 
 from config import settings
+from services.data_sources import DataSource, SourceRouter
+from services.stock_statements import (
+    INVALID_STATEMENT_NAME,
+    build_statements,
+    prepare_all,
+)
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# 分页查询时每次从游标取回并转换的行数
+FETCH_BATCH_SIZE = 100
+
+
+def encode_cursor(created_at: datetime, news_id: Any) -> str:
+    """把 (created_at, id) 编码为不透明的增量游标"""
+    raw = json.dumps([created_at.isoformat(), news_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, Any]:
+    """
+    解码增量游标
+
+    Raises:
+        ValueError: 游标格式不正确
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, news_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), news_id
+    except Exception:
+        raise ValueError("无效的游标") from None
+
+
+def _row_to_news(row: Sequence[Any], include_content: bool) -> Dict[str, Any]:
+    """把查询结果行（stock_statements 中 NEWS_COLUMNS / TITLE_COLUMNS 顺序）转换为字典"""
+    news = {
+        "id": row[0],
+        "title": row[1],
+        "source": row[2],
+        "created_at": row[3].isoformat() if row[3] else None,
+        "updated_at": row[4].isoformat() if row[4] else None
+    }
+    if include_content:
+        news["content"] = row[5]
+    return news
+
+
+def _connection_factory():
+    """延迟导入 psycopg2，返回带初始化标记的连接类"""
+    import psycopg2.extensions
+
+    class StockConnection(psycopg2.extensions.connection):
+        # 连接建立后的一次性设置（search_path 等）是否已完成
+        initialized = False
+
+    return StockConnection
+
+
+def _is_connection_error(error: BaseException) -> bool:
+    """连接类错误可以切换到其他数据源重试；查询被取消（语句超时）不重试"""
+    import psycopg2
+    import psycopg2.extensions
+    import psycopg2.pool
+
+    if isinstance(error, psycopg2.extensions.QueryCanceledError):
+        return False
+    return isinstance(error, (psycopg2.OperationalError, psycopg2.InterfaceError, psycopg2.pool.PoolError, TimeoutError))
+
+
+def connection_params(config: Dict[str, Any]) -> Dict[str, Any]:
+    """数据源配置（config.settings.data_sources("postgres") 的一项）对应的 psycopg2 连接参数"""
+    return {
+        "host": config["host"],
+        "port": int(config["port"]),
+        "dbname": config["dbname"],
+        "user": config["user"],
+        "password": config["password"],
+        "sslmode": config.get("sslmode", "require"),
+        "connect_timeout": settings.POSTGRES_CONNECT_TIMEOUT,
+    }
+
+
+class _SourcePool:
+    """单个 PostgreSQL 数据源的连接池（创建时建立 POSTGRES_POOL_MIN 个连接）"""
+
+    def __init__(self, config: Dict[str, Any]):
+        from psycopg2.pool import ThreadedConnectionPool
+
+        self.pool = ThreadedConnectionPool(
+            settings.POSTGRES_POOL_MIN,
+            settings.POSTGRES_POOL_MAX,
+            connection_factory=_connection_factory(),
+            **connection_params(config)
+        )
+        # ThreadedConnectionPool 满时直接报错，用信号量让并发查询排队等待空闲连接
+        self.slots = threading.BoundedSemaphore(settings.POSTGRES_POOL_MAX)
+
+    def stats(self) -> Dict[str, Any]:
+        in_use = len(self.pool._used)
+        return {
+            "in_use": in_use,
+            "idle": len(self.pool._pool),
+            "max": self.pool.maxconn,
+            "saturation": round(in_use / self.pool.maxconn, 2) if self.pool.maxconn else None
+        }
+
 
 class StockService:
     """PostgreSQL 数据库服务 - 美股科技股票资讯"""
 
     def __init__(self):
-        self.conn_params = {
-            "host": settings.POSTGRES_HOST,
-            "port": int(settings.POSTGRES_PORT),
-            "dbname": settings.POSTGRES_DB,
-            "user": settings.POSTGRES_USER,
-            "password": settings.POSTGRES_PASSWORD,
-            "sslmode": "require"
+        # 可配置多个只读副本，按延迟路由；每个数据源的连接池在首次使用时创建
+        self._sources = SourceRouter(
+            "postgres",
+            settings.data_sources("postgres"),
+            _SourcePool,
+            _is_connection_error,
+            failure_threshold=settings.DATA_SOURCE_FAILURE_THRESHOLD,
+            cooldown=settings.DATA_SOURCE_COOLDOWN,
+            probe_timeout=settings.DATA_SOURCE_PROBE_TIMEOUT
+        )
+        self._statements = build_statements()
+        self._prepared = settings.POSTGRES_PREPARED_STATEMENTS
+        logger.info("Stock Service 已初始化 (%s 个数据源)", len(self._sources.sources))
+
+    def _setup_connection(self, conn) -> None:
+        """新连接的一次性设置：schema 和预编译语句"""
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            # 设置 schema
+            cur.execute(f"SET search_path TO {settings.POSTGRES_SCHEMA}")
+            # 兜底的语句超时，正常情况下由工具截止时间先行取消查询
+            cur.execute("SELECT set_config('statement_timeout', %s, false)", (str(settings.POSTGRES_STATEMENT_TIMEOUT_MS),))
+            if self._prepared:
+                prepare_all(cur, self._statements)
+        conn.initialized = True
+
+    def _execute(self, cur, name: str, params: Sequence[Any] = ()) -> None:
+        """
+        执行具名语句
+
+        启用预编译时发送 EXECUTE；若语句在服务端已不存在（连接被重置），
+        重新预编译后重试一次。
+        """
+        statement = self._statements[name]
+        if not self._prepared:
+            cur.execute(statement.sql, params)
+            return
+
+        try:
+            cur.execute(statement.execute_sql, params)
+        except Exception as e:
+            if getattr(e, "pgcode", None) != INVALID_STATEMENT_NAME:
+                raise
+            logger.warning("预编译语句 %s 不存在，重新预编译", name)
+            prepare_all(cur, self._statements)
+            cur.execute(statement.execute_sql, params)
+
+    @contextmanager
+    def _cursor(self, source: DataSource):
+        """从数据源的连接池借出连接并返回游标，用完归还（连接已断开则丢弃）"""
+        pool: _SourcePool = self._sources.client(source)
+        if not pool.slots.acquire(timeout=settings.POSTGRES_CONNECT_TIMEOUT):
+            raise TimeoutError(f"等待 PostgreSQL 数据源 {source.name} 空闲连接超时")
+        try:
+            conn = pool.pool.getconn()
+            try:
+                if not conn.initialized:
+                    self._setup_connection(conn)
+                with conn.cursor() as cur:
+                    yield cur
+            finally:
+                pool.pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            pool.slots.release()
+
+    async def _run(self, func: Callable[[Any], T]) -> T:
+        """按数据源路由执行 func(cursor)，连接类错误时切换到下一个数据源"""
+        return await self._sources.run(lambda source: self._run_on(source, func))
+
+    async def _run_on(self, source: DataSource, func: Callable[[Any], T]) -> T:
+        """
+        在线程中借出连接执行 func(cursor)，不阻塞事件循环
+
+        调用方协程被取消（工具超时或客户端断开）时，对正在执行的查询发送
+        PostgreSQL 取消请求，使连接尽快归还连接池。
+        """
+        active: Dict[str, Any] = {}
+        active_lock = threading.Lock()
+
+        def work() -> T:
+            with self._cursor(source) as cur:
+                with active_lock:
+                    active["conn"] = cur.connection
+                try:
+                    return func(cur)
+                finally:
+                    # 归还连接前清除，避免取消请求落到复用该连接的其他查询上
+                    with active_lock:
+                        active.clear()
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, work)
+        except asyncio.CancelledError:
+            with active_lock:
+                conn = active.get("conn")
+                if conn is not None:
+                    conn.cancel()
+                    logger.info("请求已取消，已中止正在执行的 PostgreSQL 查询")
+            raise
+
+    def _ping_source(self, source: DataSource) -> None:
+        with self._cursor(source) as cur:
+            cur.execute("SELECT 1")
+            cur.fetchone()
+
+    def ping(self) -> None:
+        """
+        对每个数据源借出连接并完成一次往返查询（同步调用，用于启动预热和后台健康探测）
+
+        探测延迟用于数据源路由，全部失败时抛出异常。
+        """
+        self._sources.probe(self._ping_source)
+
+    def pool_stats(self) -> Optional[Dict[str, Any]]:
+        """各数据源连接池的使用情况，连接池尚未创建时返回 None"""
+        stats = {
+            source.name: source.client.stats()
+            for source in self._sources.sources
+            if source.client is not None
         }
-        logger.info("Stock Service 已初始化")
+        return stats or None
+
+    def source_stats(self) -> List[Dict[str, Any]]:
+        """各数据源的路由状态"""
+        return self._sources.snapshot()
 
-    def _get_connection(self):
-        """获取数据库连接"""
-        conn = psycopg2.connect(**self.conn_params)
-        cur = conn.cursor()
-        # 设置 schema
-        cur.execute(f"SET search_path TO {settings.POSTGRES_SCHEMA}")
-        return conn, cur
+    def close(self) -> None:
+        """关闭所有连接池"""
+        for source in self._sources.sources:
+            if source.client is not None:
+                source.client.pool.closeall()
+                source.client = None
 
     async def get_latest_stock_news(self, days_back: int = 7) -> List[Dict[str, Any]]:
         """
@@ -40,129 +265,203 @@ class StockService:
             days_back: 向前查找的天数，默认7天
 
         Returns:
-            股票资讯列表
+            股票资讯列表（最新的 100 条，更多数据使用 get_stock_news_page 翻页）
+        """
+        page = await self.get_stock_news_page(days_back=days_back, page_size=100)
+        return page["news"]
+
+    async def get_stock_news_page(
+        self,
+        days_back: int = 7,
+        page_size: int = 50,
+        cursor: Optional[Tuple[datetime, Any]] = None,
+        include_content: bool = True
+    ) -> Dict[str, Any]:
+        """
+        分页获取最近 days_back 天的股票资讯（按时间降序）
+
+        使用 (created_at, id) 键集分页：每页从上一页最后一条之后继续扫描索引，
+        翻页成本与页码无关；查询全部参数化，结果按 FETCH_BATCH_SIZE 分批转换。
+
+        Args:
+            days_back: 向前查找的天数
+            page_size: 每页条数
+            cursor: decode_cursor 解码后的上一页 next_cursor，None 表示第一页
+            include_content: 是否返回正文
+
+        Returns:
+            包含资讯列表、next_cursor（没有更多数据时为 None）和 has_more 的字典
         """
+        variant = "full" if include_content else "titles"
+        if cursor is None:
+            name = f"stock_news_page_first_{variant}"
+            params: List[Any] = [days_back, page_size + 1]
+        else:
+            name = f"stock_news_page_next_{variant}"
+            params = [days_back, cursor[0], cursor[1], page_size + 1]
+
+        def query(cur) -> Tuple[List[Dict[str, Any]], Any, bool]:
+            news_list: List[Dict[str, Any]] = []
+            last_row = None
+            self._execute(cur, name, params)
+            while len(news_list) < page_size:
+                rows = cur.fetchmany(min(FETCH_BATCH_SIZE, page_size - len(news_list)))
+                if not rows:
+                    break
+                news_list.extend(_row_to_news(row, include_content) for row in rows)
+                last_row = rows[-1]
+            return news_list, last_row, cur.fetchone() is not None
+
         try:
-            conn, cur = self._get_connection()
-
-            # 查询最近几天的数据，按创建时间降序
-            # 使用 DATE(created_at) 来按日期分组，获取最新交易日的所有资讯
-            query = f"""
-                SELECT title, content, source, created_at, updated_at
-                FROM {settings.STOCK_TABLE}
-                WHERE created_at >= NOW() - INTERVAL '{days_back} days'
-                ORDER BY created_at DESC
-                LIMIT 100
-            """
-
-            cur.execute(query)
-            rows = cur.fetchall()
-
-            if not rows:
-                logger.info(f"未找到最近 {days_back} 天的股票资讯")
-                cur.close()
-                conn.close()
-                return []
-
-            # 转换为字典列表
-            result = []
-            for row in rows:
-                result.append({
-                    "title": row[0],
-                    "content": row[1],
-                    "source": row[2],
-                    "created_at": row[3].isoformat() if row[3] else None,
-                    "updated_at": row[4].isoformat() if row[4] else None
-                })
-
-            # 获取最新交易日日期
-            latest_date = rows[0][3].date() if rows[0][3] else None
-            logger.info(f"获取了 {len(result)} 条股票资讯，最新交易日: {latest_date}")
-
-            cur.close()
-            conn.close()
-
-            return result
+            news_list, last_row, has_more = await self._run(query)
+
+            logger.info("获取了 %s 条股票资讯 (最近 %s 天，%s)", len(news_list), days_back, '后续页' if cursor else '第一页')
+
+            return {
+                "news_count": len(news_list),
+                "news": news_list,
+                "next_cursor": encode_cursor(last_row[3], last_row[0]) if has_more and last_row else None,
+                "has_more": has_more
+            }
 
         except Exception as e:
-            logger.error(f"获取股票资讯失败: {str(e)}")
-            return []
+            logger.error("获取股票资讯失败: %s", e)
+            return {
+                "news_count": 0,
+                "news": [],
+                "next_cursor": None,
+                "has_more": False,
+                "error": str(e)
+            }
 
-    async def get_latest_trading_day_news(self) -> Dict[str, Any]:
+    async def get_latest_trading_day_news(self, include_content: bool = True) -> Dict[str, Any]:
         """
         获取最新交易日的所有股票资讯
 
         自动处理周末和节假日，返回最近一个交易日的数据
 
+        Args:
+            include_content: 是否返回正文，False 时只返回标题等元数据
+
         Returns:
-            包含交易日期和资讯列表的字典
+            包含交易日期、资讯列表和增量游标（next_cursor，指向最新一条）的字典
         """
-        try:
-            conn, cur = self._get_connection()
+        variant = "full" if include_content else "titles"
 
+        def query(cur) -> Optional[Tuple[Any, List[Any]]]:
             # 先找到最新的交易日日期
-            query = f"""
-                SELECT DATE(created_at) as trading_date
-                FROM {settings.STOCK_TABLE}
-                WHERE created_at >= NOW() - INTERVAL '7 days'
-                GROUP BY DATE(created_at)
-                ORDER BY DATE(created_at) DESC
-                LIMIT 1
-            """
-
-            cur.execute(query)
+            self._execute(cur, "stock_latest_trading_date")
             row = cur.fetchone()
-
             if not row:
+                return None
+
+            # 获取该交易日的所有资讯
+            self._execute(cur, f"stock_trading_day_news_{variant}", (row[0],))
+            return row[0], cur.fetchall()
+
+        try:
+            found = await self._run(query)
+
+            if found is None:
                 logger.info("未找到最近7天的股票资讯")
-                cur.close()
-                conn.close()
                 return {
                     "trading_date": None,
                     "news_count": 0,
-                    "news": []
+                    "news": [],
+                    "next_cursor": None
                 }
 
-            latest_trading_date = row[0]
+            latest_trading_date, rows = found
 
-            # 获取该交易日的所有资讯
-            query = f"""
-                SELECT title, content, source, created_at, updated_at
-                FROM {settings.STOCK_TABLE}
-                WHERE DATE(created_at) = %s
-                ORDER BY created_at DESC
-            """
-
-            cur.execute(query, (latest_trading_date,))
-            rows = cur.fetchall()
-
-            # 转换为字典列表
-            news_list = []
-            for row in rows:
-                news_list.append({
-                    "title": row[0],
-                    "content": row[1],
-                    "source": row[2],
-                    "created_at": row[3].isoformat() if row[3] else None,
-                    "updated_at": row[4].isoformat() if row[4] else None
-                })
-
-            logger.info(f"获取了最新交易日 {latest_trading_date} 的 {len(news_list)} 条资讯")
-
-            cur.close()
-            conn.close()
+            news_list = [_row_to_news(row, include_content) for row in rows]
+
+            logger.info("获取了最新交易日 %s 的 %s 条资讯", latest_trading_date, len(news_list))
 
             return {
                 "trading_date": str(latest_trading_date),
                 "news_count": len(news_list),
-                "news": news_list
+                "news": news_list,
+                "next_cursor": encode_cursor(rows[0][3], rows[0][0]) if rows else None
             }
 
         except Exception as e:
-            logger.error(f"获取最新交易日资讯失败: {str(e)}")
+            logger.error("获取最新交易日资讯失败: %s", e)
             return {
                 "trading_date": None,
                 "news_count": 0,
                 "news": [],
+                "next_cursor": None,
                 "error": str(e)
             }
+
+    async def get_stock_news_since(
+        self,
+        since: Tuple[datetime, Any],
+        limit: int = 100,
+        include_content: bool = True
+    ) -> Dict[str, Any]:
+        """
+        增量获取游标之后的新资讯
+
+        按 (created_at, id) 行比较做索引范围扫描，只返回比游标更新的行（按时间升序）。
+
+        Args:
+            since: decode_cursor 解码后的 (created_at, id)
+            limit: 最多返回条数，超出时 has_more 为 True，可用 next_cursor 继续获取
+            include_content: 是否返回正文
+
+        Returns:
+            包含资讯列表、next_cursor 和 has_more 的字典；没有新资讯时 next_cursor 保持不变
+        """
+        variant = "full" if include_content else "titles"
+        since_created_at, since_id = since
+        def query(cur) -> List[Any]:
+            self._execute(
+                cur,
+                f"stock_news_since_{variant}",
+                (since_created_at, since_id, limit + 1)
+            )
+            return cur.fetchall()
+
+        try:
+            rows = await self._run(query)
+
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            news_list = [_row_to_news(row, include_content) for row in rows]
+
+            logger.info("增量获取了 %s 条股票资讯 (since: %s)", len(news_list), since_created_at.isoformat())
+
+            return {
+                "news_count": len(news_list),
+                "news": news_list,
+                "next_cursor": encode_cursor(rows[-1][3], rows[-1][0]) if rows else encode_cursor(since_created_at, since_id),
+                "has_more": has_more
+            }
+
+        except Exception as e:
+            logger.error("增量获取股票资讯失败: %s", e)
+            return {
+                "news_count": 0,
+                "news": [],
+                "next_cursor": encode_cursor(since_created_at, since_id),
+                "has_more": False,
+                "error": str(e)
+            }
+
+    async def get_stock_news_content(self, ids: List[Any]) -> List[Dict[str, Any]]:
+        """根据 id 获取资讯正文（配合只返回标题的查询按需获取）"""
+        def query(cur) -> List[Any]:
+            self._execute(cur, "stock_news_content", (list(ids),))
+            return cur.fetchall()
+
+        try:
+            rows = await self._run(query)
+
+            logger.info("获取了 %s 条股票资讯正文", len(rows))
+
+            return [_row_to_news(row, True) for row in rows]
+
+        except Exception as e:
+            logger.error("获取股票资讯正文失败: %s", e)
+            return []
@@ -0,0 +1,121 @@
+"""
+股票资讯查询语句
+
+所有 StockService 查询集中定义在这里。启用预编译时，每个连接在建立后
+对全部语句执行一次 PREPARE，之后的查询只发送 EXECUTE 和参数，
+PostgreSQL 不再重复解析和规划；关闭预编译（如经过 transaction 模式的
+pgbouncer）时退化为普通的参数化查询。
+"""
+
+import logging
+import re
+from typing import Any, Dict, Sequence
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# 资讯查询列：完整内容 / 只有标题（content 按需通过 id 获取）
+NEWS_COLUMNS = "id, title, source, created_at, updated_at, content"
+TITLE_COLUMNS = "id, title, source, created_at, updated_at"
+
+# PostgreSQL 错误码：预编译语句不存在（连接被重置或执行过 DISCARD ALL）
+INVALID_STATEMENT_NAME = "26000"
+
+# 语句名 -> (SQL 模板, 参数类型)；模板中的 {columns}/{table} 在建立语句时替换，
+# 参数使用 %s 占位，预编译时依次转换为 $1、$2 ...
+# 游标相关参数不声明类型，由列类型推断，避免 timestamp/timestamptz 隐式转换导致索引失效
+_TEMPLATES: Dict[str, tuple] = {
+    "latest_trading_date": ("""
+        SELECT DATE(created_at) as trading_date
+        FROM {table}
+        WHERE created_at >= NOW() - INTERVAL '7 days'
+        GROUP BY DATE(created_at)
+        ORDER BY DATE(created_at) DESC
+        LIMIT 1
+    """, ()),
+    "trading_day_news": ("""
+        SELECT {columns}
+        FROM {table}
+        WHERE DATE(created_at) = %s
+        ORDER BY created_at DESC, id DESC
+    """, ("date",)),
+    "news_since": ("""
+        SELECT {columns}
+        FROM {table}
+        WHERE (created_at, id) > (%s, %s)
+        ORDER BY created_at, id
+        LIMIT %s
+    """, (None, None, "bigint")),
+    "news_page_first": ("""
+        SELECT {columns}
+        FROM {table}
+        WHERE created_at >= NOW() - make_interval(days => %s)
+        ORDER BY created_at DESC, id DESC
+        LIMIT %s
+    """, ("integer", "bigint")),
+    "news_page_next": ("""
+        SELECT {columns}
+        FROM {table}
+        WHERE created_at >= NOW() - make_interval(days => %s)
+        AND (created_at, id) < (%s, %s)
+        ORDER BY created_at DESC, id DESC
+        LIMIT %s
+    """, ("integer", None, None, "bigint")),
+    "news_content": ("""
+        SELECT {full_columns}
+        FROM {table}
+        WHERE id = ANY(%s)
+        ORDER BY created_at DESC, id DESC
+    """, (None,)),
+}
+
+# 带 {columns} 的语句分别生成完整内容（_full）和只有标题（_titles）两个版本，
+# 其余语句（如 news_content 固定返回完整内容）只生成一个
+_VARIANTS = {"full": NEWS_COLUMNS, "titles": TITLE_COLUMNS}
+
+
+class Statement:
+    """一条具名查询：普通参数化 SQL 以及对应的 PREPARE 语句"""
+
+    __slots__ = ("name", "sql", "param_count", "prepare_sql", "execute_sql")
+
+    def __init__(self, name: str, sql: str, param_types: Sequence[Any]):
+        self.name = name
+        self.sql = sql
+        self.param_count = len(param_types)
+
+        counter = iter(range(1, self.param_count + 1))
+        numbered = re.sub(r"%s", lambda _: f"${next(counter)}", sql)
+        # 未指定类型的参数（如 id）交给 PostgreSQL 按上下文推断
+        if any(param_types):
+            types = ", ".join(t or "unknown" for t in param_types)
+            self.prepare_sql = f"PREPARE {name} ({types}) AS {numbered}"
+        else:
+            self.prepare_sql = f"PREPARE {name} AS {numbered}"
+
+        placeholders = ", ".join(["%s"] * self.param_count)
+        self.execute_sql = f"EXECUTE {name}({placeholders})" if placeholders else f"EXECUTE {name}"
+
+
+def build_statements() -> Dict[str, Statement]:
+    """根据当前配置的表名生成全部语句"""
+    statements: Dict[str, Statement] = {}
+    for base_name, (template, param_types) in _TEMPLATES.items():
+        if "{columns}" in template:
+            for suffix, columns in _VARIANTS.items():
+                name = f"stock_{base_name}_{suffix}"
+                sql = template.format(columns=columns, table=settings.STOCK_TABLE)
+                statements[name] = Statement(name, sql, param_types)
+        else:
+            name = f"stock_{base_name}"
+            sql = template.format(full_columns=NEWS_COLUMNS, table=settings.STOCK_TABLE)
+            statements[name] = Statement(name, sql, param_types)
+    return statements
+
+
+def prepare_all(cur, statements: Dict[str, Statement]) -> None:
+    """在当前连接上预编译全部语句（连接建立后调用一次）"""
+    for statement in statements.values():
+        cur.execute(statement.prepare_sql)
+    logger.debug("已在连接上预编译 %s 条语句", len(statements))
@@ -1,74 +1,319 @@
-from supabase import create_client, Client
-from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Callable, List, Dict, Any, Optional, Tuple
+from collections import OrderedDict
+from datetime import date as date_cls, datetime, timedelta
+import asyncio
+import concurrent.futures
 import logging
 
 from config import settings
+from core.deadline import check_deadline, current_deadline
+from services.data_sources import SourceRouter
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 logger = logging.getLogger(__name__)
 
+# PostgREST 单次返回的最大行数，批量查询按此分页
+PAGE_SIZE = 1000
+# 历史日期产品缓存最多保留的天数
+HISTORICAL_CACHE_DAYS = 60
+
+
+def contiguous_date_runs(dates: List[str]) -> List[Tuple[str, str]]:
+    """把日期列表合并为连续日期段 [(开始, 结束)]，按日期升序"""
+    runs: List[List[str]] = []
+    for day in sorted(set(dates)):
+        if runs:
+            previous = datetime.strptime(runs[-1][1], '%Y-%m-%d')
+            if datetime.strptime(day, '%Y-%m-%d') - previous == timedelta(days=1):
+                runs[-1][1] = day
+                continue
+        runs.append([day, day])
+    return [(start, end) for start, end in runs]
+
+
+def _is_connection_error(error: BaseException) -> bool:
+    """网络层错误（连接失败、超时）可以切换到其他数据源重试"""
+    import httpx
+
+    return isinstance(error, (httpx.TransportError, OSError))
+
 
 class SupabaseService:
-    """Supabase 数据库服务"""
+    """
+    Supabase 数据库服务
+
+    查询出错（后端不可用、PostgREST 返回错误）时直接抛出异常，不返回空结果，
+    调用方据此区分"没有数据"和"查询失败"（失败的结果不会被缓存）。
+    """
 
     def __init__(self):
-        # Product Hunt 数据库客户端
-        self.client: Client = create_client(
-            settings.SUPABASE_URL,
-            settings.SUPABASE_KEY
+        # supabase 导入较慢，延迟到首次创建服务时
+        from supabase import ClientOptions, create_client
+
+        # PostgREST 请求超时，限制挂起的 HTTP 请求占用工作线程的时间
+        options = ClientOptions(postgrest_client_timeout=settings.SUPABASE_TIMEOUT)
+
+        def connect(config: Dict[str, Any]) -> "Client":
+            return create_client(config["url"], config["key"], options=options)
+
+        # Product Hunt 和 GitHub Trending 数据源（可配置多个镜像），客户端在首次使用时创建
+        self.ph_sources = SourceRouter(
+            "ph",
+            settings.data_sources("ph"),
+            connect,
+            _is_connection_error,
+            failure_threshold=settings.DATA_SOURCE_FAILURE_THRESHOLD,
+            cooldown=settings.DATA_SOURCE_COOLDOWN,
+            probe_timeout=settings.DATA_SOURCE_PROBE_TIMEOUT
+        )
+        self.github_sources = SourceRouter(
+            "github",
+            settings.data_sources("github"),
+            connect,
+            _is_connection_error,
+            failure_threshold=settings.DATA_SOURCE_FAILURE_THRESHOLD,
+            cooldown=settings.DATA_SOURCE_COOLDOWN,
+            probe_timeout=settings.DATA_SOURCE_PROBE_TIMEOUT
+        )
+        logger.info(
+            "Supabase 数据源已配置 (Product Hunt: %s 个, GitHub Trending: %s 个)",
+            len(self.ph_sources.sources), len(self.github_sources.sources)
         )
-        logger.info("Product Hunt Supabase 客户端已初始化")
 
-        # GitHub Trending 数据库客户端
-        self.github_client: Client = create_client(
-            settings.GITHUB_SUPABASE_URL,
-            settings.GITHUB_SUPABASE_KEY
+        # PostgREST 请求在专用线程池中执行，数量受 SUPABASE_MAX_WORKERS 限制
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=settings.SUPABASE_MAX_WORKERS, thread_name_prefix="supabase"
         )
-        logger.info("GitHub Trending Supabase 客户端已初始化")
+
+        # 历史日期的产品数据不再变化，按日期缓存: date -> 按 rank 排序的产品列表
+        self._historical_products: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+
+    async def _execute(self, sources: SourceRouter, build: Callable[["Client"], Any]):
+        """
+        在专用线程池中执行 PostgREST 查询，不阻塞事件循环
+
+        build(client) 在选中的数据源上构造查询；连接类错误时换到下一个数据源重新构造。
+        调用方被取消（工具超时或客户端断开）时立即返回，尚未开始执行的查询不再执行；
+        在线程池中排队期间工具截止时间已过的查询也不再发出。已发出的 HTTP 请求
+        最长在 SUPABASE_TIMEOUT 后结束，只占用专用线程池。
+        """
+        deadline = current_deadline()
+        loop = asyncio.get_running_loop()
+
+        def call(source):
+            check_deadline(deadline)
+            return build(sources.client(source)).execute()
+
+        def attempt(source):
+            check_deadline(deadline)
+            return loop.run_in_executor(self._executor, call, source)
+
+        return await sources.run(attempt)
+
+    def ping(self) -> None:
+        """
+        对每个 Product Hunt 数据源执行一次最小查询
+
+        同步调用，用于启动预热（提前完成 TLS 握手和连接建立）和后台健康探测，
+        在线程中执行；探测延迟用于数据源路由，全部失败时抛出异常。
+        """
+        def check(source) -> None:
+            self.ph_sources.client(source).table(settings.PRODUCTS_TABLE)\
+                .select("fetch_date")\
+                .limit(1)\
+                .execute()
+
+        self.ph_sources.probe(check)
+
+    def ping_github(self) -> None:
+        """对每个 GitHub Trending 数据源执行一次最小查询，见 ping"""
+        def check(source) -> None:
+            self.github_sources.client(source).table(settings.GITHUB_REPORTS_TABLE)\
+                .select("report_date")\
+                .limit(1)\
+                .execute()
+
+        self.github_sources.probe(check)
+
+    def source_stats(self) -> Dict[str, Any]:
+        """各数据源的路由状态"""
+        return {
+            "ph": self.ph_sources.snapshot(),
+            "github": self.github_sources.snapshot()
+        }
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """缓存状态"""
+        return {
+            "historical_dates": len(self._historical_products),
+            "historical_capacity": HISTORICAL_CACHE_DAYS
+        }
+
+    def _get_cached_products(self, date: str) -> Optional[List[Dict[str, Any]]]:
+        """读取历史日期缓存"""
+        products = self._historical_products.get(date)
+        if products is not None:
+            self._historical_products.move_to_end(date)
+        return products
+
+    def _cache_products(self, date: str, products: List[Dict[str, Any]]) -> None:
+        """缓存历史日期的产品（今天及以后的数据仍可能变化，不缓存）"""
+        if date >= date_cls.today().isoformat():
+            return
+        self._historical_products[date] = products
+        self._historical_products.move_to_end(date)
+        while len(self._historical_products) > HISTORICAL_CACHE_DAYS:
+            self._historical_products.popitem(last=False)
 
     async def get_latest_products(self, days_ago: int = 0) -> List[Dict[str, Any]]:
         """获取最近的产品数据（默认获取今天的数据）"""
-        try:
-            # 计算查询日期
-            target_date = datetime.now() - timedelta(days=days_ago)
-            date_str = target_date.strftime('%Y-%m-%d')
+        # 计算查询日期
+        target_date = datetime.now() - timedelta(days=days_ago)
+        date_str = target_date.strftime('%Y-%m-%d')
 
-            # 查询数据
-            response = self.client.table(settings.PRODUCTS_TABLE)\
+        # 查询数据
+        def query(client):
+            return client.table(settings.PRODUCTS_TABLE)\
                 .select("*")\
                 .gte('fetch_date', f'{date_str}T00:00:00')\
                 .lte('fetch_date', f'{date_str}T23:59:59')\
-                .order('rank')\
-                .execute()
+                .order('rank')
 
-            products = response.data if response.data else []
-            logger.info(f"从 Supabase 获取了 {len(products)} 个产品 (日期: {date_str})")
+        response = await self._execute(self.ph_sources, query)
 
-            return products
+        products = response.data if response.data else []
+        logger.info("从 Supabase 获取了 %s 个产品 (日期: %s)", len(products), date_str)
 
-        except Exception as e:
-            logger.error(f"获取产品数据失败: {str(e)}")
-            return []
+        return products
 
     async def get_products_by_date(self, date: str) -> List[Dict[str, Any]]:
         """根据日期获取产品数据"""
-        try:
-            response = self.client.table(settings.PRODUCTS_TABLE)\
+        cached = self._get_cached_products(date)
+        if cached is not None:
+            logger.info("命中缓存: %s 个产品 (日期: %s)", len(cached), date)
+            return cached
+
+        def query(client):
+            return client.table(settings.PRODUCTS_TABLE)\
                 .select("*")\
                 .gte('fetch_date', f'{date}T00:00:00')\
                 .lte('fetch_date', f'{date}T23:59:59')\
-                .order('rank')\
-                .execute()
+                .order('rank')
 
-            products = response.data if response.data else []
-            logger.info(f"获取了 {len(products)} 个产品 (日期: {date})")
+        response = await self._execute(self.ph_sources, query)
 
-            return products
+        products = response.data if response.data else []
+        logger.info("获取了 %s 个产品 (日期: %s)", len(products), date)
 
-        except Exception as e:
-            logger.error(f"根据日期获取产品失败: {str(e)}")
+        self._cache_products(date, products)
+        return products
+
+    async def fetch_products_in_range(
+        self,
+        start_date: str,
+        end_date: str,
+        columns: str = "*",
+        since: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        获取日期范围内的全部产品行（按 fetch_date、rank 排序，按 PAGE_SIZE 分页）
+
+        提供 since（fetch_date）时只返回在此之后抓取的行，用于增量更新。
+        """
+        rows: List[Dict[str, Any]] = []
+        offset = 0
+        while True:
+            def query(client):
+                builder = client.table(settings.PRODUCTS_TABLE)\
+                    .select(columns)\
+                    .gte('fetch_date', f'{start_date}T00:00:00')\
+                    .lte('fetch_date', f'{end_date}T23:59:59')
+                if since:
+                    builder = builder.gt('fetch_date', since)
+                return builder\
+                    .order('fetch_date')\
+                    .order('rank')\
+                    .range(offset, offset + PAGE_SIZE - 1)
+
+            response = await self._execute(self.ph_sources, query)
+            page = response.data if response.data else []
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                break
+            offset += PAGE_SIZE
+        return rows
+
+    async def get_products_by_ids(self, ids: List[Any]) -> List[Dict[str, Any]]:
+        """按 id 获取产品的完整数据（不保证顺序）"""
+        if not ids:
             return []
 
+        def query(client):
+            return client.table(settings.PRODUCTS_TABLE)\
+                .select("*")\
+                .in_('id', ids)
+
+        response = await self._execute(self.ph_sources, query)
+        return response.data if response.data else []
+
+    async def get_products_by_dates(
+        self,
+        dates: List[str],
+        limit: int = 10
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        批量获取多个日期的产品数据
+
+        已缓存的历史日期直接读取缓存，其余日期按连续日期段合并为 fetch_date
+        范围查询（每段一次，并发执行；超过单页行数时按 PAGE_SIZE 分页），
+        在服务端按天分组。不相邻的日期不会合并，避免读取中间不需要的日期。
+
+        Args:
+            dates: 日期列表，格式为 YYYY-MM-DD
+            limit: 每天返回的产品数量（按 rank 排序）
+
+        Returns:
+            日期到产品列表的映射，按日期降序；没有数据的日期对应空列表
+        """
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        missing: List[str] = []
+        for date in dates:
+            cached = self._get_cached_products(date)
+            if cached is not None:
+                grouped[date] = cached
+            else:
+                missing.append(date)
+
+        if missing:
+            runs = contiguous_date_runs(missing)
+            pages = await asyncio.gather(*(
+                self.fetch_products_in_range(start, end) for start, end in runs
+            ))
+            rows = [row for page in pages for row in page]
+
+            fetched: Dict[str, List[Dict[str, Any]]] = {date: [] for date in missing}
+            for row in rows:
+                day = (row.get("fetch_date") or "")[:10]
+                if day in fetched:
+                    fetched[day].append(row)
+
+            for date, products in fetched.items():
+                products.sort(key=lambda p: (p.get("rank") is None, p.get("rank")))
+                self._cache_products(date, products)
+                grouped[date] = products
+
+            logger.info(
+                "批量获取了 %s 个产品 (%s 个日期段，缓存命中 %s 天)",
+                len(rows), len(runs), len(dates) - len(missing)
+            )
+
+        return {
+            date: grouped[date][:limit]
+            for date in sorted(grouped, reverse=True)
+        }
+
     async def search_products(
         self,
         keyword: str,
@@ -76,75 +321,68 @@ class SupabaseService:
         limit: int = 20
     ) -> List[Dict[str, Any]]:
         """搜索产品（按名称、标语或描述）"""
-        try:
-            # 计算日期范围
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=days)
+        # 计算日期范围
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=days)
 
-            start_str = start_date.strftime('%Y-%m-%d')
-            end_str = end_date.strftime('%Y-%m-%d')
+        start_str = start_date.strftime('%Y-%m-%d')
+        end_str = end_date.strftime('%Y-%m-%d')
 
-            # 使用 ilike 进行模糊搜索（同时搜索中英文字段）
-            keyword_pattern = f"%{keyword}%"
+        # 使用 ilike 进行模糊搜索（同时搜索中英文字段）
+        keyword_pattern = f"%{keyword}%"
 
-            response = self.client.table(settings.PRODUCTS_TABLE)\
+        def query(client):
+            return client.table(settings.PRODUCTS_TABLE)\
                 .select("*")\
                 .gte('fetch_date', f'{start_str}T00:00:00')\
                 .lte('fetch_date', f'{end_str}T23:59:59')\
                 .or_(f"name.ilike.{keyword_pattern},tagline.ilike.{keyword_pattern},description.ilike.{keyword_pattern},tagline_cn.ilike.{keyword_pattern},description_cn.ilike.{keyword_pattern}")\
                 .order('fetch_date', desc=True)\
                 .order('rank')\
-                .limit(limit)\
-                .execute()
+                .limit(limit)
 
-            products = response.data if response.data else []
-            logger.info(f"搜索 '{keyword}' 找到 {len(products)} 个产品")
+        response = await self._execute(self.ph_sources, query)
 
-            return products
+        products = response.data if response.data else []
+        # 关键词来自用户输入，只在 DEBUG 级别记录
+        logger.info("搜索找到 %s 个产品", len(products))
+        logger.debug("搜索关键词: %r", keyword)
 
-        except Exception as e:
-            logger.error(f"搜索产品失败: {str(e)}")
-            return []
+        return products
 
-    async def get_report_by_date(self, date: str) -> Optional[Dict[str, Any]]:
+    async def get_report_by_date(self, date: str, columns: str = "*") -> Optional[Dict[str, Any]]:
         """根据日期获取报告"""
-        try:
-            response = self.client.table(settings.REPORTS_TABLE)\
-                .select("*")\
+        def query(client):
+            return client.table(settings.REPORTS_TABLE)\
+                .select(columns)\
                 .eq('report_date', date)\
-                .limit(1)\
-                .execute()
+                .limit(1)
 
-            if response.data and len(response.data) > 0:
-                logger.info(f"获取了日期 {date} 的报告")
-                return response.data[0]
+        response = await self._execute(self.ph_sources, query)
 
-            logger.info(f"未找到日期 {date} 的报告")
-            return None
+        if response.data and len(response.data) > 0:
+            logger.info("获取了日期 %s 的报告", date)
+            return response.data[0]
 
-        except Exception as e:
-            logger.error(f"根据日期获取报告失败: {str(e)}")
-            return None
+        logger.info("未找到日期 %s 的报告", date)
+        return None
 
-    async def get_latest_report(self) -> Optional[Dict[str, Any]]:
+    async def get_latest_report(self, columns: str = "*") -> Optional[Dict[str, Any]]:
         """获取最新的日报"""
-        try:
-            response = self.client.table(settings.REPORTS_TABLE)\
-                .select("*")\
+        def query(client):
+            return client.table(settings.REPORTS_TABLE)\
+                .select(columns)\
                 .order('created_at', desc=True)\
-                .limit(1)\
-                .execute()
+                .limit(1)
 
-            if response.data and len(response.data) > 0:
-                logger.info("获取了最新的日报")
-                return response.data[0]
+        response = await self._execute(self.ph_sources, query)
 
-            logger.info("未找到任何日报")
-            return None
+        if response.data and len(response.data) > 0:
+            logger.info("获取了最新的日报")
+            return response.data[0]
 
-        except Exception as e:
-            logger.error(f"获取最新日报失败: {str(e)}")
-            return None
+        logger.info("未找到任何日报")
+        return None
 
     async def get_reports_by_date_range(
         self,
@@ -152,83 +390,50 @@ class SupabaseService:
         end_date: str
     ) -> List[Dict[str, Any]]:
         """根据日期范围获取报告"""
-        try:
-            response = self.client.table(settings.REPORTS_TABLE)\
+        def query(client):
+            return client.table(settings.REPORTS_TABLE)\
                 .select("*")\
                 .gte('report_date', start_date)\
                 .lte('report_date', end_date)\
-                .order('report_date', desc=True)\
-                .execute()
+                .order('report_date', desc=True)
 
-            reports = response.data if response.data else []
-            logger.info(f"获取了 {len(reports)} 个报告 ({start_date} 到 {end_date})")
+        response = await self._execute(self.ph_sources, query)
 
-            return reports
+        reports = response.data if response.data else []
+        logger.info("获取了 %s 个报告 (%s 到 %s)", len(reports), start_date, end_date)
 
-        except Exception as e:
-            logger.error(f"根据日期范围获取报告失败: {str(e)}")
-            return []
+        return reports
 
-    async def get_top_products_by_votes(
-        self,
-        date: str,
-        limit: int = 10
-    ) -> List[Dict[str, Any]]:
-        """获取指定日期投票数最多的产品"""
-        try:
-            response = self.client.table(settings.PRODUCTS_TABLE)\
-                .select("*")\
-                .gte('fetch_date', f'{date}T00:00:00')\
-                .lte('fetch_date', f'{date}T23:59:59')\
-                .order('votes_count', desc=True)\
-                .limit(limit)\
-                .execute()
-
-            products = response.data if response.data else []
-            logger.info(f"获取了 {len(products)} 个高票产品 (日期: {date})")
-
-            return products
-
-        except Exception as e:
-            logger.error(f"获取高票产品失败: {str(e)}")
-            return []
-
-    async def get_github_trending_report_by_date(self, date: str) -> Optional[Dict[str, Any]]:
+    async def get_github_trending_report_by_date(self, date: str, columns: str = "*") -> Optional[Dict[str, Any]]:
         """根据日期获取 GitHub Trending 日报"""
-        try:
-            response = self.github_client.table(settings.GITHUB_REPORTS_TABLE)\
-                .select("*")\
+        def query(client):
+            return client.table(settings.GITHUB_REPORTS_TABLE)\
+                .select(columns)\
                 .eq('report_date', date)\
-                .limit(1)\
-                .execute()
+                .limit(1)
 
-            if response.data and len(response.data) > 0:
-                logger.info(f"获取了日期 {date} 的 GitHub Trending 日报")
-                return response.data[0]
+        response = await self._execute(self.github_sources, query)
 
-            logger.info(f"未找到日期 {date} 的 GitHub Trending 日报")
-            return None
+        if response.data and len(response.data) > 0:
+            logger.info("获取了日期 %s 的 GitHub Trending 日报", date)
+            return response.data[0]
 
-        except Exception as e:
-            logger.error(f"根据日期获取 GitHub Trending 日报失败: {str(e)}")
-            return None
+        logger.info("未找到日期 %s 的 GitHub Trending 日报", date)
+        return None
 
-    async def get_latest_github_trending_report(self) -> Optional[Dict[str, Any]]:
+    async def get_latest_github_trending_report(self, columns: str = "*") -> Optional[Dict[str, Any]]:
         """获取最新的 GitHub Trending 日报"""
-        try:
-            response = self.github_client.table(settings.GITHUB_REPORTS_TABLE)\
-                .select("*")\
+        def query(client):
+            return client.table(settings.GITHUB_REPORTS_TABLE)\
+                .select(columns)\
                 .order('report_date', desc=True)\
-                .limit(1)\
-                .execute()
+                .limit(1)
 
-            if response.data and len(response.data) > 0:
-                logger.info("获取了最新的 GitHub Trending 日报")
-                return response.data[0]
+        response = await self._execute(self.github_sources, query)
 
-            logger.info("未找到任何 GitHub Trending 日报")
-            return None
+        if response.data and len(response.data) > 0:
+            logger.info("获取了最新的 GitHub Trending 日报")
+            return response.data[0]
 
-        except Exception as e:
-            logger.error(f"获取最新 GitHub Trending 日报失败: {str(e)}")
-            return None
+        logger.info("未找到任何 GitHub Trending 日报")
+        return None
@@ -0,0 +1,287 @@
+"""core.cache 两级缓存测试（L2 使用进程内的最小 RESP 服务）"""
+
+import asyncio
+import time
+import unittest
+
+from core.cache import RespClient, ResultCache
+
+
+class FakeRespServer:
+    """支持 GET/SET(PX, NX)/DEL/EXISTS 的 RESP2 服务，数据保存在内存中"""
+
+    def __init__(self):
+        # key -> (值, 过期时间)
+        self.data = {}
+        self._server = None
+        self.port = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.port}/0"
+
+    def _get(self, key):
+        entry = self.data.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            self.data.pop(key, None)
+            return None
+        return entry[0]
+
+    def _reply(self, args):
+        command = args[0].decode().upper()
+        key = args[1]
+        if command == "GET":
+            value = self._get(key)
+            return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+        if command == "SET":
+            options = [arg.decode().upper() for arg in args[3:]]
+            if "NX" in options and self._get(key) is not None:
+                return b"$-1\r\n"
+            ttl_ms = int(options[options.index("PX") + 1])
+            self.data[key] = (args[2], time.monotonic() + ttl_ms / 1000)
+            return b"+OK\r\n"
+        if command == "DEL":
+            return b":%d\r\n" % (self.data.pop(key, None) is not None)
+        if command == "EXISTS":
+            return b":%d\r\n" % (self._get(key) is not None)
+        return b"-ERR unknown command\r\n"
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                args = []
+                for _ in range(int(line[1:-2])):
+                    length = int((await reader.readline())[1:-2])
+                    args.append((await reader.readexactly(length + 2))[:-2])
+                writer.write(self._reply(args))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+class Computation:
+    """可控的计算函数：记录调用次数，直到 release 后才返回"""
+
+    def __init__(self, value="value"):
+        self.value = value
+        self.calls = 0
+        self.started = asyncio.Event()
+        self.done = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        self.started.set()
+        await self.done.wait()
+        return self.value
+
+    def release(self):
+        self.done.set()
+
+
+class L1CacheTest(unittest.IsolatedAsyncioTestCase):
+    async def test_hit(self):
+        cache = ResultCache()
+        compute = Computation()
+        compute.release()
+        self.assertEqual(await cache.get_or_compute("k", 60, compute), "value")
+        self.assertEqual(await cache.get_or_compute("k", 60, compute), "value")
+        self.assertEqual(compute.calls, 1)
+        self.assertEqual(cache.stats()["l1_hits"], 1)
+
+    async def test_should_cache(self):
+        cache = ResultCache()
+        compute = Computation({"isError": True})
+        compute.release()
+        should_cache = lambda result: not result.get("isError")
+        await cache.get_or_compute("k", 60, compute, should_cache)
+        await cache.get_or_compute("k", 60, compute, should_cache)
+        self.assertEqual(compute.calls, 2)
+
+    async def test_lru_eviction(self):
+        cache = ResultCache(l1_max_entries=2)
+        for key in ("a", "b", "a", "c"):
+            await cache.get_or_compute(key, 60, lambda: asyncio.sleep(0, key))
+        self.assertEqual(list(cache._l1), ["a", "c"])
+
+    async def test_concurrent_misses_coalesce(self):
+        cache = ResultCache()
+        compute = Computation()
+        tasks = [asyncio.create_task(cache.get_or_compute("k", 60, compute)) for _ in range(5)]
+        await compute.started.wait()
+        compute.release()
+        self.assertEqual(await asyncio.gather(*tasks), ["value"] * 5)
+        self.assertEqual(compute.calls, 1)
+        self.assertEqual(cache.stats()["coalesced"], 4)
+        self.assertEqual(cache._inflight, {})
+
+    async def test_exception_propagates_to_waiters(self):
+        cache = ResultCache()
+        started = asyncio.Event()
+
+        async def failing():
+            started.set()
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        first = asyncio.create_task(cache.get_or_compute("k", 60, failing))
+        await started.wait()
+        second = asyncio.create_task(cache.get_or_compute("k", 60, failing))
+        results = await asyncio.gather(first, second, return_exceptions=True)
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+        self.assertEqual(cache._inflight, {})
+
+    async def test_cancelled_originator_does_not_cancel_waiters(self):
+        cache = ResultCache()
+        first_compute = Computation("first")
+        second_compute = Computation("second")
+        second_compute.release()
+
+        first = asyncio.create_task(cache.get_or_compute("k", 60, first_compute))
+        await first_compute.started.wait()
+        waiter = asyncio.create_task(cache.get_or_compute("k", 60, second_compute))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        self.assertEqual(await waiter, "second")
+        with self.assertRaises(asyncio.CancelledError):
+            await first
+        self.assertEqual(second_compute.calls, 1)
+        self.assertEqual(cache._inflight, {})
+
+    async def test_cancelled_waiter_does_not_cancel_originator(self):
+        cache = ResultCache()
+        compute = Computation()
+        first = asyncio.create_task(cache.get_or_compute("k", 60, compute))
+        await compute.started.wait()
+        waiter = asyncio.create_task(cache.get_or_compute("k", 60, compute))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        compute.release()
+        self.assertEqual(await first, "value")
+        self.assertEqual(compute.calls, 1)
+
+
+class L2CacheTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = FakeRespServer()
+        await self.server.start()
+        self.caches = []
+
+    async def asyncTearDown(self):
+        for cache in self.caches:
+            await cache.close()
+        await self.server.stop()
+
+    def new_cache(self, **kwargs) -> ResultCache:
+        cache = ResultCache(l2=RespClient(self.server.url), **kwargs)
+        self.caches.append(cache)
+        return cache
+
+    def lock_keys(self):
+        return [key for key in self.server.data if key.endswith(b":lock")]
+
+    async def test_shared_between_instances(self):
+        compute = Computation()
+        compute.release()
+        self.assertEqual(await self.new_cache().get_or_compute("k", 60, compute), "value")
+        other = self.new_cache()
+        self.assertEqual(await other.get_or_compute("k", 60, compute), "value")
+        self.assertEqual(compute.calls, 1)
+        self.assertEqual(other.stats()["l2_hits"], 1)
+        self.assertEqual(self.lock_keys(), [])
+
+    async def test_instances_coalesce_through_lock(self):
+        first_compute = Computation("first")
+        second_compute = Computation("second")
+        second_compute.release()
+
+        first = asyncio.create_task(self.new_cache().get_or_compute("k", 60, first_compute))
+        await first_compute.started.wait()
+        self.assertEqual(len(self.lock_keys()), 1)
+        second = asyncio.create_task(self.new_cache().get_or_compute("k", 60, second_compute))
+        await asyncio.sleep(0.1)
+        first_compute.release()
+
+        self.assertEqual(await asyncio.gather(first, second), ["first", "first"])
+        self.assertEqual(second_compute.calls, 0)
+        self.assertEqual(self.lock_keys(), [])
+
+    async def test_waiter_stops_when_lock_released_without_result(self):
+        first_compute = Computation({"isError": True})
+        second_compute = Computation({"text": "second"})
+        second_compute.release()
+        should_cache = lambda result: not result.get("isError")
+
+        first = asyncio.create_task(self.new_cache().get_or_compute("k", 60, first_compute, should_cache))
+        await first_compute.started.wait()
+        second = asyncio.create_task(self.new_cache(lock_ttl=30).get_or_compute("k", 60, second_compute, should_cache))
+        await asyncio.sleep(0.1)
+        first_compute.release()
+
+        started = time.monotonic()
+        self.assertEqual(await asyncio.wait_for(second, timeout=5), {"text": "second"})
+        self.assertLess(time.monotonic() - started, 1)
+        await first
+        self.assertEqual(self.lock_keys(), [])
+
+    async def test_wait_bounded_by_max_wait(self):
+        first_compute = Computation("first")
+        second_compute = Computation("second")
+        second_compute.release()
+
+        first = asyncio.create_task(self.new_cache().get_or_compute("k", 60, first_compute))
+        await first_compute.started.wait()
+        started = time.monotonic()
+        value = await self.new_cache(lock_ttl=30).get_or_compute("k", 60, second_compute, max_wait=0.2)
+        self.assertEqual(value, "second")
+        self.assertLess(time.monotonic() - started, 1)
+        first_compute.release()
+        await first
+
+    async def test_lock_released_on_failure_and_cancellation(self):
+        cache = self.new_cache()
+
+        async def failing():
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            await cache.get_or_compute("a", 60, failing)
+        self.assertEqual(self.lock_keys(), [])
+
+        compute = Computation()
+        task = asyncio.create_task(cache.get_or_compute("b", 60, compute))
+        await compute.started.wait()
+        self.assertEqual(len(self.lock_keys()), 1)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertEqual(self.lock_keys(), [])
+
+    async def test_l2_unavailable_falls_back_to_l1(self):
+        await self.server.stop()
+        cache = ResultCache(l2=RespClient(self.server.url))
+        compute = Computation()
+        compute.release()
+        self.assertEqual(await cache.get_or_compute("k", 60, compute), "value")
+        self.assertEqual(await cache.get_or_compute("k", 60, compute), "value")
+        self.assertEqual(compute.calls, 1)
+        self.assertFalse(cache.stats()["l2_available"])
+        self.assertEqual(cache.stats()["l2_errors"], 1)
+        await self.server.start()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+"""core.rate_limit 令牌桶和客户端标识测试"""
+
+import unittest
+from unittest import mock
+
+from core.rate_limit import MemoryBackend, RateLimiter, RateLimitExceeded, client_identity
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class MemoryBackendTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch("core.rate_limit.time.monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.backend = MemoryBackend()
+
+    async def test_new_bucket_starts_full(self):
+        allowed, tokens, wait = await self.backend.consume("a", 1, 10, 1)
+        self.assertTrue(allowed)
+        self.assertEqual(tokens, 9)
+        self.assertEqual(wait, 0.0)
+
+    async def test_denial_reports_wait_time(self):
+        await self.backend.consume("a", 8, 10, 2)
+        allowed, tokens, wait = await self.backend.consume("a", 5, 10, 2)
+        self.assertFalse(allowed)
+        self.assertEqual(tokens, 2)
+        # 还差 3 个令牌，每秒恢复 2 个
+        self.assertAlmostEqual(wait, 1.5)
+
+    async def test_denial_does_not_consume(self):
+        await self.backend.consume("a", 10, 10, 1)
+        await self.backend.consume("a", 5, 10, 1)
+        self.clock.now += 5
+        allowed, tokens, _ = await self.backend.consume("a", 5, 10, 1)
+        self.assertTrue(allowed)
+        self.assertEqual(tokens, 0)
+
+    async def test_refill(self):
+        await self.backend.consume("a", 10, 10, 2)
+        self.clock.now += 1
+        allowed, tokens, _ = await self.backend.consume("a", 3, 10, 2)
+        self.assertFalse(allowed)
+        self.assertEqual(tokens, 2)
+        self.clock.now += 0.5
+        allowed, tokens, _ = await self.backend.consume("a", 3, 10, 2)
+        self.assertTrue(allowed)
+        self.assertEqual(tokens, 0)
+
+    async def test_refill_is_capped_at_capacity(self):
+        await self.backend.consume("a", 1, 10, 1)
+        self.clock.now += 3600
+        allowed, tokens, _ = await self.backend.consume("a", 1, 10, 1)
+        self.assertTrue(allowed)
+        self.assertEqual(tokens, 9)
+
+    async def test_buckets_are_per_key(self):
+        await self.backend.consume("a", 10, 10, 1)
+        allowed, _, _ = await self.backend.consume("b", 10, 10, 1)
+        self.assertTrue(allowed)
+
+    async def test_prune_drops_only_full_buckets(self):
+        self.backend.MAX_BUCKETS = 2
+        await self.backend.consume("idle", 1, 10, 1)
+        await self.backend.consume("busy", 10, 10, 1)
+        self.clock.now += 1
+        await self.backend.consume("new", 1, 10, 1)
+        self.assertNotIn("idle", self.backend._buckets)
+        self.assertIn("busy", self.backend._buckets)
+        self.assertIn("new", self.backend._buckets)
+
+
+class RateLimiterTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch("core.rate_limit.time.monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_exceeded(self):
+        limiter = RateLimiter(capacity=3, refill_rate=1)
+        self.assertEqual(await limiter.check("ip:1", 2), 1)
+        with self.assertRaises(RateLimitExceeded) as ctx:
+            await limiter.check("ip:1", 2)
+        self.assertEqual(ctx.exception.client, "ip:1")
+        self.assertAlmostEqual(ctx.exception.retry_after, 1.0)
+
+    async def test_cost_above_capacity_is_clamped(self):
+        limiter = RateLimiter(capacity=3, refill_rate=1)
+        self.assertEqual(await limiter.check("ip:1", 10), 0)
+        self.clock.now += 3
+        self.assertEqual(await limiter.check("ip:1", 10), 0)
+
+
+class ClientIdentityTest(unittest.TestCase):
+    def test_client_host(self):
+        self.assertEqual(client_identity({}, "10.0.0.1"), "ip:10.0.0.1")
+        self.assertEqual(client_identity({}, None), "ip:unknown")
+
+    def test_forwarded_ignored_unless_trusted(self):
+        headers = {"x-forwarded-for": "1.1.1.1"}
+        self.assertEqual(client_identity(headers, "10.0.0.1"), "ip:10.0.0.1")
+
+    def test_forwarded_uses_proxy_appended_entry(self):
+        # 最左侧的地址由客户端伪造，可信代理追加的是最右侧的地址
+        headers = {"x-forwarded-for": "6.6.6.6, 1.1.1.1"}
+        self.assertEqual(client_identity(headers, "10.0.0.1", trust_forwarded=True), "ip:1.1.1.1")
+        headers = {"x-forwarded-for": "6.6.6.6, 1.1.1.1, 10.0.0.2"}
+        self.assertEqual(
+            client_identity(headers, "10.0.0.1", trust_forwarded=True, trusted_hops=2),
+            "ip:1.1.1.1"
+        )
+
+    def test_forwarded_too_short(self):
+        headers = {"x-forwarded-for": "1.1.1.1"}
+        self.assertEqual(
+            client_identity(headers, "10.0.0.1", trust_forwarded=True, trusted_hops=2),
+            "ip:10.0.0.1"
+        )
+        self.assertEqual(client_identity({}, "10.0.0.1", trust_forwarded=True), "ip:10.0.0.1")
+
+    def test_api_keys(self):
+        keys = {"secret"}
+        by_header = client_identity({"x-api-key": "secret"}, "10.0.0.1", api_keys=keys)
+        by_bearer = client_identity({"authorization": "Bearer secret"}, "10.0.0.2", api_keys=keys)
+        self.assertTrue(by_header.startswith("key:"))
+        self.assertNotIn("secret", by_header)
+        self.assertEqual(by_header, by_bearer)
+
+    def test_unknown_api_key_uses_ip(self):
+        headers = {"x-api-key": "random"}
+        self.assertEqual(client_identity(headers, "10.0.0.1", api_keys={"secret"}), "ip:10.0.0.1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+"""services.report_sections 章节拆分测试"""
+
+import unittest
+
+from services.report_sections import select_sections, split_sections
+
+REPORT = """# 日报
+
+导语
+
+## 热门产品
+
+产品 A
+
+### 详细分析
+
+分析内容
+
+## 融资动态
+
+融资内容
+
+## 总结 ##
+
+结语
+"""
+
+
+class SplitSectionsTest(unittest.TestCase):
+    def test_split(self):
+        sections = split_sections(REPORT)
+        self.assertEqual([title for title, _ in sections], ["日报", "热门产品", "详细分析", "融资动态", "总结"])
+
+    def test_section_includes_subsections(self):
+        sections = dict(split_sections(REPORT))
+        self.assertEqual(sections["热门产品"], "## 热门产品\n\n产品 A\n\n### 详细分析\n\n分析内容")
+        self.assertEqual(sections["详细分析"], "### 详细分析\n\n分析内容")
+        self.assertEqual(sections["总结"], "## 总结 ##\n\n结语")
+
+    def test_top_level_section_spans_document(self):
+        sections = dict(split_sections(REPORT))
+        self.assertEqual(sections["日报"], REPORT.strip())
+
+    def test_no_headings(self):
+        self.assertEqual(split_sections("纯文本\n#不是标题"), ())
+
+
+class SelectSectionsTest(unittest.TestCase):
+    def test_select_case_insensitive(self):
+        result = select_sections("# Intro\n\na\n\n# Funding\n\nb", ["funding"])
+        self.assertEqual(result["sections"], [{"title": "Funding", "content": "# Funding\n\nb"}])
+        self.assertEqual(result["available_sections"], ["Intro", "Funding"])
+
+    def test_subsection_not_repeated(self):
+        result = select_sections(REPORT, ["产品", "分析"])
+        self.assertEqual([section["title"] for section in result["sections"]], ["热门产品"])
+
+    def test_multiple_matches_in_order(self):
+        result = select_sections(REPORT, ["总结", "融资"])
+        self.assertEqual([section["title"] for section in result["sections"]], ["融资动态", "总结"])
+
+    def test_no_match(self):
+        result = select_sections(REPORT, ["不存在"])
+        self.assertEqual(result["sections"], [])
+        self.assertEqual(len(result["available_sections"]), 5)
+
+    def test_non_string_content(self):
+        self.assertEqual(select_sections(None, ["a"]), {"sections": [], "available_sections": []})
+
+
+if __name__ == "__main__":
+    unittest.main()
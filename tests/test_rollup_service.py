@@ -0,0 +1,63 @@
+"""services.rollup_service 汇总统计和 services.supabase_service 日期段测试"""
+
+import unittest
+
+from services.rollup_service import _labels, _percentile, _summarize
+from services.supabase_service import contiguous_date_runs
+
+
+class PercentileTest(unittest.TestCase):
+    def test_empty(self):
+        self.assertEqual(_percentile([], 50), 0)
+
+    def test_single(self):
+        for p in (0, 50, 99, 100):
+            self.assertEqual(_percentile([7], p), 7)
+
+    def test_nearest_rank(self):
+        votes = list(range(1, 11))
+        self.assertEqual(_percentile(votes, 0), 1)
+        self.assertEqual(_percentile(votes, 10), 1)
+        self.assertEqual(_percentile(votes, 11), 2)
+        self.assertEqual(_percentile(votes, 50), 5)
+        self.assertEqual(_percentile(votes, 90), 9)
+        self.assertEqual(_percentile(votes, 99), 10)
+        self.assertEqual(_percentile(votes, 100), 10)
+
+    def test_summarize(self):
+        summary = _summarize([1, 2, 3, 10])
+        self.assertEqual(summary["count"], 4)
+        self.assertEqual(summary["votes_sum"], 16)
+        self.assertEqual(summary["votes_avg"], 4)
+        self.assertEqual(summary["votes_max"], 10)
+        self.assertEqual(summary["votes_p50"], 2)
+        self.assertEqual(summary["votes_p99"], 10)
+        self.assertEqual(_summarize([])["votes_avg"], 0)
+
+
+class LabelsTest(unittest.TestCase):
+    def test_formats(self):
+        self.assertEqual(_labels(None), [])
+        self.assertEqual(_labels("AI, Dev Tools,"), ["AI", "Dev Tools"])
+        self.assertEqual(_labels(["AI", ""]), ["AI"])
+        self.assertEqual(_labels([{"name": "AI"}, {"username": "bob"}, {}]), ["AI", "bob"])
+        self.assertEqual(_labels({"name": "AI"}), ["AI"])
+
+
+class ContiguousDateRunsTest(unittest.TestCase):
+    def test_runs(self):
+        self.assertEqual(contiguous_date_runs([]), [])
+        self.assertEqual(
+            contiguous_date_runs(["2024-01-03", "2024-01-01", "2024-01-02", "2024-01-05", "2024-01-05"]),
+            [("2024-01-01", "2024-01-03"), ("2024-01-05", "2024-01-05")]
+        )
+
+    def test_month_and_leap_boundaries(self):
+        self.assertEqual(
+            contiguous_date_runs(["2024-02-28", "2024-02-29", "2024-03-01", "2023-12-31", "2024-01-01"]),
+            [("2023-12-31", "2024-01-01"), ("2024-02-28", "2024-03-01")]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+"""core.schema 参数校验测试"""
+
+import unittest
+
+from core.schema import SchemaValidationError, compile_schema
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "date": {"type": "string", "format": "date"},
+        "limit": {"type": "integer", "minimum": 1, "maximum": 100},
+        "ratio": {"type": "number", "minimum": 0, "maximum": 1},
+        "include_content": {"type": "boolean"},
+        "keyword": {"type": "string", "minLength": 2, "maxLength": 5},
+        "sort": {"type": "string", "enum": ["votes", "rank"]},
+        "ids": {
+            "type": "array",
+            "items": {"type": "integer", "minimum": 1},
+            "minItems": 1,
+            "maxItems": 3,
+            "uniqueItems": True
+        }
+    },
+    "required": ["date"],
+    "additionalProperties": False
+}
+
+
+class CompileSchemaTest(unittest.TestCase):
+    def setUp(self):
+        self.validate = compile_schema(SCHEMA)
+
+    def assertInvalid(self, arguments, message):
+        with self.assertRaises(SchemaValidationError) as ctx:
+            self.validate(arguments)
+        self.assertIn(message, str(ctx.exception))
+
+    def test_valid_arguments(self):
+        self.validate({
+            "date": "2024-02-29",
+            "limit": 1,
+            "ratio": 0.5,
+            "include_content": False,
+            "keyword": "ai",
+            "sort": "votes",
+            "ids": [1, 2, 3]
+        })
+
+    def test_required(self):
+        self.assertInvalid({}, "缺少必需参数: date")
+        self.assertInvalid({"limit": 10}, "缺少必需参数: date")
+
+    def test_additional_properties(self):
+        self.assertInvalid({"date": "2024-01-01", "bogus": 1}, "不支持的参数: bogus")
+
+    def test_date_format(self):
+        for value in ("2024-02-30", "2023-02-29", "2024-13-01", "20240101", "yesterday"):
+            with self.subTest(value=value):
+                self.assertInvalid({"date": value}, "date 不是合法的 date")
+
+    def test_types(self):
+        self.assertInvalid({"date": 20240101}, "date 应为 string 类型")
+        self.assertInvalid({"date": "2024-01-01", "limit": "10"}, "limit 应为 integer 类型")
+        self.assertInvalid({"date": "2024-01-01", "limit": 1.5}, "limit 应为 integer 类型")
+        self.assertInvalid({"date": "2024-01-01", "ratio": "0.5"}, "ratio 应为 number 类型")
+        self.assertInvalid({"date": "2024-01-01", "include_content": "false"}, "include_content 应为 boolean 类型")
+        self.assertInvalid({"date": "2024-01-01", "ids": 1}, "ids 应为 array 类型")
+        with self.assertRaises(SchemaValidationError):
+            compile_schema({"type": "object"})([])
+
+    def test_bool_is_not_a_number(self):
+        self.assertInvalid({"date": "2024-01-01", "limit": True}, "limit 应为 integer 类型")
+        self.assertInvalid({"date": "2024-01-01", "ratio": False}, "ratio 应为 number 类型")
+
+    def test_numeric_boundaries(self):
+        self.validate({"date": "2024-01-01", "limit": 100, "ratio": 0})
+        self.validate({"date": "2024-01-01", "ratio": 1.0})
+        self.assertInvalid({"date": "2024-01-01", "limit": 0}, "limit 不能小于 1")
+        self.assertInvalid({"date": "2024-01-01", "limit": 101}, "limit 不能大于 100")
+        self.assertInvalid({"date": "2024-01-01", "ratio": 1.01}, "ratio 不能大于 1")
+
+    def test_string_length_boundaries(self):
+        self.validate({"date": "2024-01-01", "keyword": "ab"})
+        self.validate({"date": "2024-01-01", "keyword": "abcde"})
+        self.assertInvalid({"date": "2024-01-01", "keyword": "a"}, "keyword 长度不能小于 2")
+        self.assertInvalid({"date": "2024-01-01", "keyword": "abcdef"}, "keyword 长度不能大于 5")
+
+    def test_enum(self):
+        self.assertInvalid({"date": "2024-01-01", "sort": "name"}, "sort 取值必须是")
+
+    def test_array_items(self):
+        self.assertInvalid({"date": "2024-01-01", "ids": []}, "ids 至少需要 1 项")
+        self.assertInvalid({"date": "2024-01-01", "ids": [1, 2, 3, 4]}, "ids 最多允许 3 项")
+        self.assertInvalid({"date": "2024-01-01", "ids": [1, 1]}, "ids 中存在重复项")
+        self.assertInvalid({"date": "2024-01-01", "ids": [1, "2"]}, "ids[1] 应为 integer 类型")
+        self.assertInvalid({"date": "2024-01-01", "ids": [0]}, "ids[0] 不能小于 1")
+
+    def test_nested_path(self):
+        validate = compile_schema({
+            "type": "object",
+            "properties": {
+                "range": {
+                    "type": "object",
+                    "properties": {"start": {"type": "string", "format": "date"}}
+                }
+            }
+        })
+        with self.assertRaises(SchemaValidationError) as ctx:
+            validate({"range": {"start": "2024-02-30"}})
+        self.assertIn("range.start 不是合法的 date", str(ctx.exception))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+"""services.stock_service 增量游标测试"""
+
+import unittest
+from datetime import datetime, timezone
+
+from services.stock_service import decode_cursor, encode_cursor
+
+
+class CursorTest(unittest.TestCase):
+    def test_round_trip(self):
+        for created_at, news_id in (
+            (datetime(2024, 1, 2, 9, 30, 0, 123456), 42),
+            (datetime(2024, 1, 2, 9, 30, tzinfo=timezone.utc), "a-b"),
+        ):
+            with self.subTest(created_at=created_at):
+                cursor = encode_cursor(created_at, news_id)
+                self.assertEqual(decode_cursor(cursor), (created_at, news_id))
+
+    def test_cursor_is_url_safe(self):
+        cursor = encode_cursor(datetime(2024, 1, 2, 9, 30), 42)
+        self.assertRegex(cursor, r"^[A-Za-z0-9_-]+$")
+
+    def test_invalid_cursor(self):
+        for cursor in ("", "not a cursor", "e30", encode_cursor(datetime(2024, 1, 2), 1)[:-3]):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(ValueError):
+                    decode_cursor(cursor)
+
+
+if __name__ == "__main__":
+    unittest.main()